@@ -0,0 +1,53 @@
+# Courier detection throughput over a large synthetic AWB corpus.
+#
+#   python benchmarks/bench_detect.py --ids 1000000
+
+import argparse
+import random
+import re
+import time
+
+from stub_server import track_shipments
+
+
+def make_corpus(n, seed=3):
+    rng = random.Random(seed)
+    digits = "0123456789"
+    shapes = [
+        lambda: rng.choice("56789") + "".join(rng.choices(digits, k=10)),                   # Blue Dart
+        lambda: rng.choice("DZVIX") + "".join(rng.choices(digits, k=8)),                    # DTDC
+        lambda: "".join(rng.choices(digits, k=14)),                                         # Delhivery
+        lambda: "".join(rng.choices(digits, k=13)),                                         # Delhivery
+        lambda: "".join(rng.choices(digits, k=rng.choice((9, 10, 12)))),                   # ambiguous
+        lambda: "".join(rng.choices("ABCXYZ0123456789-", k=rng.randint(4, 20))),            # junk
+    ]
+    return [rng.choice(shapes)() for _ in range(n)]
+
+
+def naive_detect(tid, rules=[(c, p, s) for c, p, _, s in track_shipments.DETECTION_RULES]):
+    # Baseline: try every pattern, compiling through the re module cache
+    tid = tid.strip().upper()
+    scores = {}
+    for courier, pattern, score in rules:
+        if re.fullmatch(pattern, tid) and score > scores.get(courier, 0): scores[courier] = score
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, default=500000)
+    args = parser.parse_args()
+    corpus = make_corpus(args.ids)
+
+    for name, fn in (("naive", naive_detect), ("detect_couriers", track_shipments.detect_couriers)):
+        start = time.perf_counter()
+        found = sum(1 for tid in corpus if fn(tid))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16} {len(corpus) / elapsed:12,.0f} IDs/s  ({found} with a candidate)")
+
+    mismatches = sum(1 for tid in corpus[:50000] if naive_detect(tid) != track_shipments.detect_couriers(tid))
+    assert not mismatches, f"{mismatches} IDs ranked differently from the naive detector"
+
+
+if __name__ == "__main__":
+    main()
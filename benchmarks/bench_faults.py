@@ -0,0 +1,85 @@
+# Retry, rate limit and circuit breaker behaviour against injected faults.
+#
+#   python benchmarks/bench_faults.py --shipments 300
+
+import argparse
+import time
+
+from stub_server import StubServer, track_shipments
+
+
+def make_items(n):
+    couriers = ["Blue Dart", "DTDC", "Delhivery"]
+    return [(f"{70000000000 + i}", couriers[i % 3]) for i in range(n)]
+
+
+def reset_policies(**overrides):
+    # Fast backoff so the benchmark finishes quickly; everything else as shipped
+    track_shipments._policies.clear()
+    for courier, limits in track_shipments.COURIER_POLICY.items():
+        track_shipments._policies[courier] = track_shipments.CourierPolicy(
+            courier, **dict(limits, base_delay=0.01, max_delay=0.05, **overrides))
+
+
+def run(server, items, label):
+    hits = server.hits
+    start = time.perf_counter()
+    results = track_shipments.refresh_many(items, force=True)
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for data in results.values() if not data.get("error"))
+    kinds = {}
+    for data in results.values():
+        if data.get("error"): kinds[data["error_class"]] = kinds.get(data["error_class"], 0) + 1
+    print(f"{label:<34} ok {ok:4d}/{len(items)}  upstream {server.hits - hits:5d}  "
+          f"{elapsed:6.2f}s  errors {kinds or '-'}")
+
+
+def check_unknown_ids(server):
+    # Unknown waybills fail whether they were in a batch (looked up again on
+    # their own) or alone in the last chunk, and each counts as one error
+    tids = [f"{80000000000 + i}" for i in range(26)]
+    server.set_faults(missing={tids[3], tids[25]})
+    key = ("tracker_errors_total", (("courier", "Delhivery"), ("kind", "permanent")))
+    before = track_shipments.METRICS.counters.get(key, 0)
+    results = track_shipments.refresh_many([(tid, "Delhivery") for tid in tids], force=True)
+    server.set_faults(missing=set())
+    assert {tid for tid, data in results.items() if data.get("error")} == {tids[3], tids[25]}
+    counted = track_shipments.METRICS.counters.get(key, 0) - before
+    assert counted == 2, f"tracker_errors_total counted {counted} of 2 unknown waybills"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    items = make_items(args.shipments)
+
+    server = StubServer(seed=args.seed, retry_after=0)
+    server.start()
+    server.redirect_trackers()
+    try:
+        reset_policies(rate=1000, burst=1000)
+        check_unknown_ids(server)
+        server.set_faults(error_rate=0.15, throttle_rate=0.1, drop_rate=0.05)
+        # Rate limit high enough not to dominate the flaky runs
+        reset_policies(rate=1000, burst=1000, max_retries=0)
+        run(server, items, "flaky upstream, no retries")
+        reset_policies(rate=1000, burst=1000)
+        run(server, items, "flaky upstream, with retries")
+
+        server.set_faults(error_rate=0, throttle_rate=0, drop_rate=0, down=True)
+        reset_policies(rate=1000, burst=1000, failure_threshold=10 ** 9)
+        run(server, items, "outage, breaker disabled")
+        reset_policies(rate=1000, burst=1000)
+        run(server, items, "outage, breaker enabled")
+
+        server.set_faults(down=False)
+        reset_policies(rate=50, burst=5)
+        run(server, items, "healthy, 50 req/s/courier limit")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# --import throughput from CSV and NDJSON files into a fresh store, after
+# checking that malformed NDJSON lines (bad JSON, non-object values) are
+# counted as invalid rather than aborting the import.
+#
+#   python benchmarks/bench_import.py --rows 200000
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from stub_server import track_shipments
+
+MALFORMED = [
+    '{"tracking_number": "51234567890", "courier": "Blue Dart"}',
+    '{"tracking_number": "51234567891"',            # truncated
+    '["51234567892", "Blue Dart"]',                 # not an object
+    '"51234567893"',
+    'null',
+    '{"awb": "D87654321"}',                         # courier detected
+    '{"awb": "51234567894", "courier": ["Blue Dart"]}',
+    '',
+    '{"courier": "Blue Dart"}',                     # no id
+]
+
+
+def check_malformed(workdir):
+    path = os.path.join(workdir, "malformed.ndjson")
+    with open(path, "w") as f: f.write("\n".join(MALFORMED) + "\n")
+    added, existing, invalid = track_shipments.import_shipments(path)
+    assert (added, existing, invalid) == (3, 0, 5), f"malformed NDJSON: got {(added, existing, invalid)}"
+    assert set(track_shipments.get_store().load()) == {"51234567890", "D87654321", "51234567894"}
+
+
+def write_rows(path, rows, ndjson):
+    with open(path, "w") as f:
+        if ndjson:
+            for i in range(rows): f.write(json.dumps({"tracking_number": str(60000000000 + i), "courier": "Blue Dart"}) + "\n")
+        else:
+            f.write("tracking_number,courier\n")
+            for i in range(rows): f.write(f"{60000000000 + i},Blue Dart\n")
+
+
+def fresh_store(workdir):
+    for name in os.listdir(workdir):
+        if name.startswith("tracking_"): os.remove(os.path.join(workdir, name))
+    track_shipments._store = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_import_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        check_malformed(workdir)
+        for fmt in ("csv", "ndjson"):
+            path = os.path.join(workdir, f"import.{fmt}")
+            write_rows(path, args.rows, fmt == "ndjson")
+            fresh_store(workdir)
+            start = time.perf_counter()
+            added, existing, invalid = track_shipments.import_shipments(path)
+            elapsed = time.perf_counter() - start
+            assert (added, existing, invalid) == (args.rows, 0, 0), (fmt, added, existing, invalid)
+            print(f"{fmt:<7} {args.rows} rows  {elapsed:6.2f}s  {args.rows / elapsed:9.0f} rows/s")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Memory held by N fetched results: the legacy nested dicts the trackers used
+# to return vs the interned __slots__ Shipment/ScanEvent model.
+#
+#   python benchmarks/bench_memory.py --shipments 100000
+
+import argparse
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from replay_server import FIXTURES
+from stub_server import track_shipments as ts
+
+
+def parsed_fixtures():
+    # One parsed result per fixture file, as the trackers return it
+    parsers = {"bluedart": ts.BlueDartTracker(), "dtdc": ts.DTDCTracker(), "delhivery": ts.DelhiveryTracker()}
+    results = []
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            body = f.read()
+        results.append(parsers[name.split("_")[0]].parse(body, "0"))
+    return results
+
+
+def build(n, templates, make):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = [make(templates[i % len(templates)], str(70000000000 + i)) for i in range(n)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, size, elapsed
+
+
+def legacy(template, tid):
+    # Fresh strings per result, like json.loads / HTMLParser produced them
+    return json.loads(template.replace('"tracking_number": "0"', f'"tracking_number": "{tid}"'))
+
+
+def model(template, tid):
+    # Timed from the same json.loads, so the build time includes the conversion
+    return ts.Shipment.from_dict(legacy(template, tid))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=20000)
+    args = parser.parse_args()
+
+    templates = [json.dumps(r, default=ts.json_default) for r in parsed_fixtures()]
+    scans = sum(len(json.loads(t)["scans"]) for t in templates) * args.shipments // len(templates)
+    print(f"{args.shipments} shipments, {scans} scans ({len(templates)} fixture shapes)")
+
+    old, old_size, old_time = build(args.shipments, templates, legacy)
+    del old
+    new, new_size, new_time = build(args.shipments, templates, model)
+    assert [s.as_dict() for s in new[:len(templates)]] == [legacy(t, str(70000000000 + i)) for i, t in enumerate(templates)]
+    del new
+
+    print(f"  dicts:    {old_size / 2**20:8.1f} MiB  {old_size / args.shipments:7.0f} B/shipment  built in {old_time:.2f}s")
+    print(f"  Shipment: {new_size / 2**20:8.1f} MiB  {new_size / args.shipments:7.0f} B/shipment  built in {new_time:.2f}s")
+    print(f"  saving:   {1 - new_size / old_size:8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# BlueDartParser micro-benchmark over the synthetic pages in fixtures/ (made by
+# make_fixtures.py, not captured from bluedart.com).
+#
+# Checks that the streaming, early-stopping parse produces exactly what the
+# original whole-page parser did, including the status when the label comes
+# after the scan table, then times both. --raw adds the Blue Dart
+# pages saved by `track_shipments.py --keep-raw` as a real-world corpus.
+#
+#   python benchmarks/bench_parser.py --repeat 200
+#   python benchmarks/bench_parser.py --raw raw_responses --repeat 5
+
+import argparse
+import glob
+import os
+import time
+from html.parser import HTMLParser
+
+from stub_server import track_shipments
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class LegacyBlueDartParser(HTMLParser):
+    # The parser as it was before streaming support, kept verbatim as the oracle
+    def __init__(self):
+        super().__init__()
+        self.output = {
+            "status": None,
+            "delivery_details": {},
+            "scans": []
+        }
+        self._current_tag = None
+        self._in_status_label = False
+        self._capture_next_p_as_status = False
+        self._in_shipment_tab = False
+        self._in_scan_tab = False
+        self._current_row = []
+        self._in_td = False
+        self._in_th = False
+
+    def handle_starttag(self, tag, attrs):
+        self._current_tag = tag
+        attrs_dict = dict(attrs)
+        if tag == "label": self._in_status_label = True
+        if tag == "div":
+            if attrs_dict.get("id", "").startswith("SHIP"):
+                self._in_shipment_tab = True; self._in_scan_tab = False
+            elif attrs_dict.get("id", "").startswith("SCAN"):
+                self._in_scan_tab = True; self._in_shipment_tab = False
+        if tag == "tr": self._current_row = []
+        if tag in ["td", "th"]: self._in_td = True; self._in_th = True
+
+    def handle_endtag(self, tag):
+        if tag == "label": self._in_status_label = False
+        if tag in ["td", "th"]: self._in_td = False; self._in_th = False
+        if tag == "tr":
+            if self._in_shipment_tab and len(self._current_row) >= 2:
+                raw_key = self._current_row[0]
+                key = " ".join(raw_key.split()).strip(" :")
+                if len(self._current_row) > 1:
+                    value = self._current_row[1]
+                    self.output["delivery_details"][key] = value
+                    if "Status" in key and not self.output["status"]:
+                        self.output["status"] = value.split("\n")[0].strip()
+            elif self._in_scan_tab and len(self._current_row) >= 3:
+                location = self._current_row[0]
+                if "Location" not in location and "24 Hr Format" not in location and "Feedback By" not in location:
+                    scan = {
+                        "location": location,
+                        "details": self._current_row[1] if len(self._current_row) > 1 else "",
+                        "date": self._current_row[2] if len(self._current_row) > 2 else "",
+                        "time": self._current_row[3] if len(self._current_row) > 3 else ""
+                    }
+                    self.output["scans"].append(scan)
+
+    def handle_data(self, data):
+        clean_data = data.strip()
+        if not clean_data: return
+        if self._in_status_label and "Status" in clean_data: self._capture_next_p_as_status = True
+        if self._capture_next_p_as_status and self._current_tag == "p":
+            self.output["status"] = clean_data; self._capture_next_p_as_status = False
+        if (self._in_td or self._in_th): self._current_row.append(clean_data)
+
+
+def chunked(raw, size):
+    for i in range(0, len(raw), size):
+        yield raw[i:i + size]
+
+
+def legacy_parse(raw):
+    parser = LegacyBlueDartParser()
+    parser.feed(raw.decode("utf-8"))
+    return parser.output
+
+
+def whole_parse(raw):
+    parser = track_shipments.BlueDartParser()
+    parser.feed(raw.decode("utf-8"))
+    return parser.output
+
+
+def streaming_parse(raw, size=16384):
+    parser = track_shipments.BlueDartParser(stop_after_scans=True)
+    parser.feed_chunks(chunked(raw, size))
+    return parser.output
+
+
+def bytes_consumed(raw, size=16384):
+    seen = 0
+    def counting():
+        nonlocal seen
+        for chunk in chunked(raw, size):
+            seen += len(chunk)
+            yield chunk
+    parser = track_shipments.BlueDartParser(stop_after_scans=True)
+    parser.feed_chunks(counting())
+    return seen
+
+
+def timeit(fn, raw, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat): fn(raw)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--raw", metavar="DIR", help="Also check and time archived pages from this raw response archive")
+    args = parser.parse_args()
+
+    pages = [(os.path.basename(path), open(path, "rb").read())
+             for path in sorted(glob.glob(os.path.join(FIXTURES, "bluedart_*.html")))]
+    if args.raw:
+        archive = track_shipments.RawArchive(args.raw)
+        digests = dict.fromkeys(e["sha256"] for e in archive.entries() if e["courier"] == "Blue Dart")
+        pages += [(f"raw {digest[:12]}", archive.get(digest)) for digest in digests]
+
+    for name, raw in pages:
+        expected = legacy_parse(raw)
+        assert whole_parse(raw) == expected, f"{name}: whole-page parse diverged"
+        for size in (1, 7, 512, 16384):
+            streamed = streaming_parse(raw, size)
+            assert streamed["status"] == expected["status"], \
+                f"{name}: streaming status {streamed['status']!r} != full-page {expected['status']!r} at chunk size {size}"
+            assert streamed == expected, f"{name}: streaming parse diverged at chunk size {size}"
+
+        legacy_ms = timeit(legacy_parse, raw, args.repeat)
+        whole_ms = timeit(whole_parse, raw, args.repeat)
+        stream_ms = timeit(streaming_parse, raw, args.repeat)
+        print(f"{name} ({len(raw) // 1024} KiB, {len(expected['scans'])} scans, "
+              f"streaming reads {bytes_consumed(raw) // 1024} KiB)")
+        print(f"  legacy feed():     {legacy_ms:7.3f} ms/page")
+        print(f"  feed():            {whole_ms:7.3f} ms/page")
+        print(f"  feed_chunks():     {stream_ms:7.3f} ms/page  ({legacy_ms / stream_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
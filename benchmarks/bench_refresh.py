@@ -0,0 +1,58 @@
+# Serial refresh loop vs. refresh_many() against the local stub server.
+#
+#   python benchmarks/bench_refresh.py --shipments 200 --latency 0.05
+
+import argparse
+import time
+
+from stub_server import StubServer, track_shipments
+
+
+def make_items(n):
+    couriers = ["Blue Dart", "DTDC", "Delhivery"]
+    return [(f"{70000000000 + i}", couriers[i % 3]) for i in range(n)]
+
+
+def serial(items):
+    results = {}
+    for tid, courier in items:
+        results[tid] = track_shipments.get_tracker(courier).get_details(tid)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=120)
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-request stub delay (s)")
+    args = parser.parse_args()
+
+    server = StubServer(latency=args.latency).start()
+    server.redirect_trackers()
+    # Measure the engine, not the per-courier rate limit
+    for limits in track_shipments.COURIER_POLICY.values():
+        limits.update(rate=10 ** 6, burst=10 ** 6)
+    items = make_items(args.shipments)
+    try:
+        start = time.perf_counter()
+        expected = serial(items)
+        serial_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        got = track_shipments.refresh_many(items, force=True)
+        parallel_s = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    assert got == expected, "refresh_many() diverged from the serial loop"
+    batched_hits = server.hits - len(items)
+    assert list(got) == list(expected), "refresh_many() changed result order"
+    print(f"shipments={len(items)} latency={args.latency * 1000:.0f}ms")
+    print(f"serial:       {serial_s:7.2f}s  {len(items) / serial_s:8.1f} shipments/s")
+    print(f"refresh_many: {parallel_s:7.2f}s  {len(items) / parallel_s:8.1f} shipments/s")
+    print(f"speedup:      {serial_s / parallel_s:7.1f}x")
+    print(f"requests:     {len(items)} serial, {batched_hits} batched")
+    print(f"connections:  {server.connections} opened for {server.hits} requests")
+
+
+if __name__ == "__main__":
+    main()
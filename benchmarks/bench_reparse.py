@@ -0,0 +1,100 @@
+# --reparse over a raw response archive seeded from the fixtures: re-parse
+# throughput with a process pool, after checking that an archived body older
+# than the stored state does not overwrite it, and that a refresh answered
+# from the response cache leaves the archived body current.
+#
+#   python benchmarks/bench_reparse.py --shipments 5000 --workers 4
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from replay_server import ReplayServer, load_fixtures
+from stub_server import track_shipments as ts
+
+
+def fresh_store():
+    if ts._store is not None and hasattr(ts._store, "conn"): ts._store.conn.close()
+    ts._store = None
+    for name in os.listdir("."):
+        if name.startswith("tracking_"): os.remove(name)
+    return ts.get_store()
+
+
+def check_newer_store():
+    # ...890 was checked again after its body was archived; ...891 holds what
+    # its archived body said, so only ...891 may be re-parsed
+    store = fresh_store()
+    archive = ts.RawArchive("raw_check")
+    body = load_fixtures("bluedart_in_transit.html")[0]
+    stored = {"status": "Delivered", "summary": {"status": "Shipment Delivered", "recipient": "A"}}
+    for tid in ("51234567890", "51234567891"):
+        archive.put("Blue Dart", [tid], body)
+    store.insert_new_many([("51234567890", dict(stored, courier="Blue Dart", checked_at=time.time() + 60)),
+                           ("51234567891", dict(stored, courier="Blue Dart", checked_at=archive.unrecorded["51234567891"]))])
+    parsed, failed, _ = ts.reparse_archive(store.load(), workers=1, archive=archive)
+    assert set(parsed) == {"51234567891"} and not failed, f"re-parsed {sorted(parsed)}"
+    after = store.load()
+    assert after["51234567890"]["summary"] == stored["summary"], "an older archived body overwrote newer stored state"
+    assert after["51234567891"]["summary"]["status"] == "In Transit. Await delivery information"
+
+
+def check_cache_hit():
+    # Two refreshes with --keep-raw, the second served from the cache: the
+    # stored state still comes from the archived body, so it is re-parsed
+    store = fresh_store()
+    ts.CACHE = ts.ResponseCache()
+    ts.RAW_ARCHIVE = ts.RawArchive("raw_cached")
+    replay = ReplayServer().start()
+    replay.redirect_trackers()
+    try:
+        items = [("51234567890", "Blue Dart"), ("1234567890123", "Delhivery")]
+        store.insert_new_many((tid, {"courier": courier, "status": "Pending"}) for tid, courier in items)
+        for _ in range(2):
+            saved = store.load()
+            ts.record_refresh(saved, ts.refresh_many(items))
+        assert replay.hits == 2, f"second refresh was not served from the cache ({replay.hits} upstream requests)"
+        # Lookups that are never applied leave nothing pending either
+        ts.track_one("51234567890", "Blue Dart", force=True)
+        ts.record_refresh(store.load(), ts.refresh_many([("D87654321", "DTDC")]))  # deleted meanwhile
+        assert not ts.RAW_ARCHIVE.unrecorded, ts.RAW_ARCHIVE.unrecorded
+        parsed, failed, _ = ts.reparse_archive(store.load(), workers=1, archive=ts.RAW_ARCHIVE)
+        assert set(parsed) == {tid for tid, _ in items} and not failed, f"re-parsed {sorted(parsed)}"
+    finally:
+        replay.stop()
+        ts.RAW_ARCHIVE = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    bodies = load_fixtures("bluedart_*.html")
+    workdir = tempfile.mkdtemp(prefix="bench_reparse_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        check_newer_store()
+        check_cache_hit()
+        store = fresh_store()
+        archive = ts.RawArchive("raw_bench")
+        tids = [str(60000000000 + i) for i in range(args.shipments)]
+        for i, tid in enumerate(tids): archive.put("Blue Dart", [tid], bodies[i % len(bodies)])
+        store.insert_new_many((tid, {"courier": "Blue Dart", "status": "Pending"}) for tid in tids)
+        start = time.perf_counter()
+        parsed, failed, changes = ts.reparse_archive(store.load(), workers=args.workers, archive=archive)
+        elapsed = time.perf_counter() - start
+        assert len(parsed) == args.shipments and not failed, (len(parsed), len(failed))
+        print(f"{args.shipments} shipments, {len(bodies)} distinct bodies: {elapsed:.2f}s "
+              f"({args.shipments / elapsed:.0f} shipments/s, {len(changes)} changed)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
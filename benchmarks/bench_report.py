@@ -0,0 +1,76 @@
+# --report over a synthetic store: load + normalize scans into the columnar
+# table, then the lane transit and hub dwell aggregates.
+#
+#   python benchmarks/bench_report.py --shipments 100000 --scans 20
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from stub_server import track_shipments as ts
+
+HUBS = ["MUMBAI HUB", "DELHI HUB", "BANGALORE HUB", "CHENNAI HUB", "KOLKATA HUB", "PUNE HUB",
+        "HYDERABAD HUB", "AHMEDABAD HUB", "JAIPUR HUB", "LUCKNOW HUB", "NAGPUR HUB", "INDORE HUB"]
+# Each carrier's date/time spelling, as their parsers emit it
+STAMPS = {
+    "Blue Dart": lambda t: (time.strftime("%d %b %Y", t), time.strftime("%H:%M", t)),
+    "DTDC": lambda t: (time.strftime("%Y-%m-%d", t), time.strftime("%H:%M:%S", t)),
+    "Delhivery": lambda t: (time.strftime("%Y-%m-%d", t), time.strftime("%H:%M", t)),
+}
+
+
+def seed(n, scans, rng):
+    store = ts.get_store()
+    couriers = list(STAMPS)
+    records, histories = [], []
+    for i in range(n):
+        tid, courier = str(70000000000 + i), couriers[i % 3]
+        route = rng.sample(HUBS, 4)
+        clock = 1767225600 + rng.randrange(0, 90 * 86400)
+        events = []
+        for j in range(scans):
+            clock += rng.randrange(600, 6 * 3600)
+            date, hhmm = STAMPS[courier](time.gmtime(clock))
+            events.append({"location": route[min(3, j * 4 // scans)], "details": "Scan", "date": date, "time": hhmm})
+        records.append((tid, {"courier": courier, "status": "Delivered" if i % 4 else "Pending"}))
+        histories.append((tid, events))
+    store.insert_new_many(records)
+    store.merge_scans_many(histories, store.begin_refresh())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=50000)
+    parser.add_argument("--scans", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_report_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        seed(args.shipments, args.scans, random.Random(7))
+        print(f"seeded {args.shipments} shipments x {args.scans} scans in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        table = ts.load_scan_table()
+        loaded = time.perf_counter()
+        lanes = ts.lane_transit_stats(table)
+        transit = time.perf_counter()
+        hubs = ts.hub_dwell_stats(table)
+        dwell = time.perf_counter()
+        assert len(table.at) == args.shipments * args.scans
+        print(f"{len(table.at)} events, {len(lanes)} lanes, {len(hubs)} hubs")
+        print(f"  load + normalize  {loaded - start:6.2f}s")
+        print(f"  lane transit      {transit - loaded:6.2f}s")
+        print(f"  hub dwell         {dwell - transit:6.2f}s")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# --serve request throughput through ServiceClient against the fixture replay
+# server, after round-trip checks of the routes the --server client uses.
+#
+#   python benchmarks/bench_service.py --shipments 300 --requests 500
+
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from replay_server import ReplayServer
+from stub_server import track_shipments as ts
+
+IDS = {"51234567890": "Blue Dart", "D87654321": "DTDC", "1234567890123": "Delhivery"}
+
+
+def check_routes(client):
+    for tid, courier in IDS.items():
+        status, data = client.add(tid, courier)
+        assert status == 201 and data["added"], (tid, status, data)
+        # A tracked result is a Shipment on the server; it must arrive as one object
+        status, data = client.track(tid, courier, force=True)
+        assert status == 200 and data["tracking_number"] == tid and data["courier"] == courier, (tid, status, data)
+        assert data["scans"] and set(data["scans"][0]) == {"location", "details", "date", "time"}, data["scans"][:1]
+    status, data = client.call("PUT", "/shipments")
+    assert status == 405 and "error" in data, (status, data)
+    out = io.StringIO()
+    client.refresh_stream(out, force=True)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(line["tracking_number"] for line in lines) == sorted(IDS), lines
+    for body in ([], "51234567890"):
+        status, data = client.call("POST", "/shipments", body)
+        assert status == 400 and "error" in data, (body, status, data)
+    # Added by another process (its own store connection): listed and refreshed
+    other = ts.STORES[ts.STORE_BACKEND]()
+    other.insert_new_many([("51234567899", {"courier": "Blue Dart", "status": "Pending"})])
+    status, data = client.call("GET", "/shipments")
+    assert status == 200 and "51234567899" in data, data
+    seen = []
+    for shard in ((0, 2), (1, 2)):
+        out = io.StringIO()
+        client.refresh_stream(out, force=True, shard=shard, workers=2)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert all(ts.in_shard(line["tracking_number"], shard) for line in lines), (shard, lines)
+        seen += [line["tracking_number"] for line in lines]
+    assert sorted(seen) == sorted([*IDS, "51234567899"]), seen
+    status, data = client.refresh(force=True, shard=(2, 2))
+    assert status == 400 and "error" in data, (status, data)
+    client.delete("51234567899")
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for _ in range(n): fn()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_service_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    replay = ReplayServer().start()
+    replay.redirect_trackers()
+    for limits in ts.COURIER_POLICY.values(): limits.update(rate=10 ** 6, burst=10 ** 6)
+    server = ts.make_service_server("127.0.0.1:0")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = ts.ServiceClient(f"127.0.0.1:{server.server_address[1]}")
+        check_routes(client)
+        for i in range(args.shipments): client.add(str(60000000000 + i), "Blue Dart")
+        print(f"GET /shipments ({args.shipments + len(IDS)})  {timed(lambda: client.call('GET', '/shipments'), args.requests):8.0f} req/s")
+        print(f"GET /track (cached)       {timed(lambda: client.track('51234567890', 'Blue Dart'), args.requests):8.0f} req/s")
+        start = time.perf_counter()
+        client.refresh_stream(io.StringIO(), force=True)
+        print(f"POST /refresh ndjson      {time.perf_counter() - start:8.2f} s")
+    finally:
+        server.shutdown()
+        server.server_close()
+        replay.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Startup cost of the one-shot CLI commands against a seeded store: import
+# time (-X importtime, beyond what a bare interpreter imports) checked against
+# a per-command budget, modules each command must not pull in, and wall time
+# run as a script (compiled on every start) and with -m (cached bytecode).
+# Exits 1 if a budget is exceeded or a forbidden module is imported.
+#
+#   python benchmarks/bench_startup.py --shipments 20000 --repeat 5
+
+import argparse
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay_server import FIXTURES
+from stub_server import track_shipments as ts
+
+SCRIPT = os.path.abspath(ts.__file__)
+NEW_ID = "79999999999"
+
+NETWORK = ("socket", "ssl", "http.client", "urllib.error", "email.parser")
+HEAVY = NETWORK + ("http.server", "html.parser", "curses", "concurrent.futures", "multiprocessing", "gzip", "csv")
+
+# name, argv, import budget in ms, modules it must not import
+COMMANDS = [
+    ("--help", ["--help"], 40, HEAVY),
+    ("--add", ["--add", NEW_ID], 40, HEAVY),
+    ("--add (exists)", ["--add", NEW_ID], 40, HEAVY),
+    ("--delete", ["--delete", NEW_ID], 40, HEAVY),
+    ("--delete (missing)", ["--delete", NEW_ID], 40, HEAVY),
+    ("--find", ["--find", "70000000007"], 40, HEAVY),
+    ("--report", ["--report"], 50, NETWORK + ("http.server", "html.parser", "curses", "concurrent.futures")),
+    ("--test-file", ["70000000007", "--courier", "Blue Dart", "--test-file",
+                     os.path.join(FIXTURES, "bluedart_in_transit.html")],
+     50, NETWORK + ("http.server", "curses", "concurrent.futures")),
+]
+
+
+def import_times(argv):
+    # {module: self time in us} for one run under -X importtime
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], capture_output=True, text=True)
+    if proc.returncode: raise SystemExit(f"{' '.join(argv)} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        own, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(own)
+    return times
+
+
+def wall(argv, env, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], capture_output=True, env=env, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        ts.get_store().insert_new_many((str(70000000000 + i), {"courier": "Blue Dart", "status": "In Transit"})
+                                       for i in range(args.shipments))
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(SCRIPT))
+        py_compile.compile(SCRIPT)  # -m loads this cached bytecode even under PYTHONDONTWRITEBYTECODE
+        bare = import_times(["-c", "pass"])
+        print(f"{args.shipments} shipments; import times beyond a bare interpreter ({sum(bare.values()) / 1000:.1f} ms)")
+        print(f"{'command':<20} {'imports':>8} {'budget':>7} {'modules':>8} {'script':>8} {'-m':>8}")
+
+        failures = []
+        for name, argv, budget, forbidden in COMMANDS:
+            runs = [import_times([SCRIPT, *argv]) for _ in range(args.repeat)]
+            own = min(sum(t for module, t in run.items() if module not in bare) for run in runs) / 1000
+            loaded = set(runs[0]) - set(bare)
+            script = wall([SCRIPT, *argv], env, args.repeat) * 1000
+            module = wall(["-m", "track_shipments", *argv], env, args.repeat) * 1000
+            print(f"{name:<20} {own:6.1f}ms {budget:5d}ms {len(loaded):8d} {script:6.1f}ms {module:6.1f}ms")
+            if own > budget: failures.append(f"{name}: imports took {own:.1f} ms, budget {budget} ms")
+            pulled = sorted(m for m in forbidden if m in loaded)
+            if pulled: failures.append(f"{name}: imported {', '.join(pulled)}")
+
+        for failure in failures: print("FAIL", failure)
+        if failures: sys.exit(1)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# Offline benchmark suite: single-ID, batch (--json) and TUI-refresh workloads
+# against the fixture replay server, plus per-carrier parse time.
+#
+#   python benchmarks/bench_suite.py                          # 10 and 1k shipments
+#   python benchmarks/bench_suite.py --sizes 10,1000,100000
+#   python benchmarks/bench_suite.py --save baseline.json
+#   python benchmarks/bench_suite.py --compare baseline.json --tolerance 0.2
+#
+# --compare exits non-zero if any throughput dropped, or p99 latency / peak
+# memory / parse time grew, by more than the tolerance.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from replay_server import FIXTURES, ReplayServer, load_fixtures
+from stub_server import track_shipments as ts
+
+SHAPES = {
+    "Blue Dart": lambda i: f"{50000000000 + i}",
+    "DTDC": lambda i: f"D{i % 100000000:08d}",
+    "Delhivery": lambda i: f"{14300000000000 + i}",
+}
+
+
+def percentile(values, q):
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class Run:
+    # Fresh store, cache and policies in a scratch directory, with per-request
+    # latency recorded around the engine's fetch calls
+    def __init__(self):
+        self.latencies = []
+        self.dir = tempfile.mkdtemp(prefix="bench_")
+
+    def __enter__(self):
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+        ts._store = None
+        ts.CACHE = ts.ResponseCache()
+        ts._policies.clear()
+        for limits in ts.COURIER_POLICY.values(): limits.update(rate=10 ** 6, burst=10 ** 6)
+        self.originals = ts.fetch_details, ts.fetch_details_many
+        ts.fetch_details = self.timed(ts.fetch_details)
+        ts.fetch_details_many = self.timed(ts.fetch_details_many)
+        return self
+
+    def __exit__(self, *exc):
+        ts.fetch_details, ts.fetch_details_many = self.originals
+        if ts._store is not None and hasattr(ts._store, "conn"): ts._store.conn.close()
+        ts._store = None
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def timed(self, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+        return wrapper
+
+
+def seed(n):
+    couriers = list(SHAPES)
+    items = [(SHAPES[couriers[i % 3]](i), couriers[i % 3]) for i in range(n)]
+    ts.get_store().insert_new_many((tid, {"courier": c, "status": "Pending"}) for tid, c in items)
+    return items
+
+
+def workload_single(n, single_max):
+    items = seed(min(n, single_max))
+    for tid, courier in items:
+        ts.fetch_details(courier, tid, force=True)
+    return len(items)
+
+
+def workload_batch(n, _):
+    # What `--json --force` does
+    seed(n)
+    saved_list = ts.load_tracking_list()
+    fetched = ts.refresh_many(((tid, info["courier"]) for tid, info in saved_list.items()), force=True)
+    ts.record_refresh(saved_list, fetched)
+    json.dumps(fetched, default=ts.json_default)
+    return len(fetched)
+
+
+def workload_tui(n, _):
+    # What the TUI R key does, through the TUI's own helpers: tui_start_refresh
+    # runs the worker, and each UI tick folds its messages in with tui_drain and
+    # rebuilds the sorted view at most every TUI_RESORT_INTERVAL
+    import queue
+    import threading
+    seed(n)
+    saved_list = ts.load_tracking_list()
+    key = ts.TUI_SORTS[0][1]
+    view = sorted(saved_list, key=key(saved_list))
+    results = queue.Queue()
+    worker, refresh = ts.tui_start_refresh(saved_list, view, results, threading.Event())
+    view_built = time.monotonic()
+    while refresh.running:
+        time.sleep(0.1)  # the UI loop's getch() timeout
+        _, changed, _ = ts.tui_drain(results, saved_list, refresh)
+        if changed and (not refresh.running or time.monotonic() - view_built >= ts.TUI_RESORT_INTERVAL):
+            view = sorted(saved_list, key=key(saved_list))
+            view_built = time.monotonic()
+    worker.join()
+    return refresh.done
+
+
+WORKLOADS = {"single": workload_single, "batch": workload_batch, "tui-refresh": workload_tui}
+
+
+def measure(name, n, single_max, memory):
+    with Run() as run:
+        start = time.perf_counter()
+        done = WORKLOADS[name](n, single_max)
+        elapsed = time.perf_counter() - start
+        latencies = run.latencies
+    result = {
+        "shipments": done,
+        "throughput": done / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    if memory:
+        # Separate pass: tracemalloc slows everything down
+        with Run():
+            tracemalloc.start()
+            WORKLOADS[name](n, single_max)
+            result["peak_mib"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+    return result
+
+
+def parse_times(repeat):
+    bodies = {
+        "Blue Dart": load_fixtures("bluedart_*.html"),
+        "DTDC": load_fixtures("dtdc_*.json"),
+        "Delhivery": load_fixtures("delhivery_*.json"),
+    }
+    results = {}
+    for courier, fixtures in bodies.items():
+        tracker = ts.get_tracker(courier)
+        tid = "14344510012345" if courier == "Delhivery" else "X"
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for body in fixtures: tracker.parse(body, tid)
+        results[courier] = {"parse_ms": (time.perf_counter() - start) / (repeat * len(fixtures)) * 1000}
+    return results
+
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for key, base in baseline.items():
+        now = current.get(key)
+        if not now: continue
+        for metric, value in base.items():
+            if metric == "shipments" or metric not in now or not value: continue
+            change = (now[metric] - value) / value
+            worse = -change if metric == "throughput" else change
+            if worse > tolerance:
+                regressions.append(f"{key} {metric}: {value:.2f} -> {now[metric]:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000", help="Comma-separated shipment counts")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--latency", type=float, default=0.002, help="Replay server base delay (s)")
+    parser.add_argument("--jitter", type=float, default=0.002, help="Replay server random extra delay (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--single-max", type=int, default=1000, help="Cap for the serial single-ID workload")
+    parser.add_argument("--parse-repeat", type=int, default=50)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass")
+    parser.add_argument("--save", help="Write results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON from --save to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = ReplayServer(latency=args.latency, jitter=args.jitter, seed=0, error_rate=args.error_rate).start()
+    server.redirect_trackers()
+    results = {}
+    try:
+        print(f"{'workload':<12} {'n':>7} {'shipments/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'peak MiB':>9}")
+        for size in (int(s) for s in args.sizes.split(",")):
+            for name in args.workloads.split(","):
+                r = measure(name, size, args.single_max, not args.no_memory)
+                results[f"{name}:{size}"] = r
+                peak = f"{r['peak_mib']:9.1f}" if "peak_mib" in r else f"{'-':>9}"
+                print(f"{name:<12} {r['shipments']:>7} {r['throughput']:12.1f} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {peak}",
+                      flush=True)
+        print()
+        for courier, r in parse_times(args.parse_repeat).items():
+            results[f"parse:{courier}"] = r
+            print(f"parse {courier:<10} {r['parse_ms']:8.3f} ms/response")
+    finally:
+        server.stop()
+
+    if args.save:
+        with open(args.save, "w") as f: json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions: print(f"REGRESSION {line}")
+        if regressions: sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Regenerates the synthetic Blue Dart pages in fixtures/. No real pages have
+# been captured: these only mimic the markup BlueDartParser depends on (status
+# label, SHIP/SCAN tab divs, the scan table) padded with page-sized CSS, script
+# and footer filler. bench_parser.py --raw checks the parser against real pages
+# saved with `track_shipments.py --keep-raw`.
+#
+#   python benchmarks/make_fixtures.py
+
+import os
+import random
+from datetime import datetime, timedelta
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+LOCATIONS = ["AHMEDABAD", "BANGALORE HUB", "BHIWANDI APEX", "CHENNAI APEX", "DELHI GATEWAY", "GURGAON",
+             "HOSUR", "KOLKATA HUB", "MUMBAI HUB", "NAGPUR HUB", "OKHLA", "PUNE"]
+DETAILS = ["Shipment Picked Up", "Shipment Outscanned To Network", "Shipment Arrived", "Connected",
+           "Shipment Further Connected", "In Transit. Await delivery information",
+           "Network Delay, Will Impact Delivery", "Shipment Out For Delivery"]
+# Minutes between consecutive scans
+SCAN_STEP = 53
+
+HEAD = "\n".join(
+    ['<!DOCTYPE html>', '<html lang="en">', '<head>', '<meta charset="utf-8">',
+     '<meta name="viewport" content="width=device-width, initial-scale=1">',
+     '<title>Blue Dart - Track Your Shipment</title>', '<style type="text/css">']
+    + [f".bd-c{n}{{margin:{n % 7}px {n % 5}px;padding:{n % 3}px;color:#{n * 0x377a4f % 0x1000000:06x};"
+       "font-family:Arial,Helvetica,sans-serif}" for n in range(600)]
+    + ['</style>', '<script type="text/javascript">']
+    + [f"function bdTrack{n}(e){{var n=document.getElementById('t{n}');if(n&&e.keyCode<{10 + n % 30})"
+       f"{{n.className+=' a{n}';}}return false;}}" for n in range(300)]
+    + ['</script>', '</head>', '<body class="bd-track">',
+       '<header class="navbar navbar-default"><div class="container"><a class="navbar-brand" href="/">Blue Dart &#8212; DHL Group</a>',
+       '<ul class="nav navbar-nav"><li><a href="/tracking">Track</a></li><li><a href="/services">Services</a></li>'
+       '<li><a href="/contact-us">Contact</a></li></ul></div></header>',
+       '<div class="container trackResult">'])
+
+FOOT = "\n".join(
+    ['<footer class="site-footer"><div class="container"><ul class="footer-links">']
+    + [f'<li class="footer-link"><a href="/services/{n}">Service &amp; Solutions {n}</a></li>' for n in range(250)]
+    + ['</ul><p class="copyright">&copy; 2026 Blue Dart Express Limited. All rights reserved.</p></div></footer>',
+       "<script type=\"text/javascript\">window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);} "
+       "gtag('js', new Date());</script>", '</body>', '</html>', ''])
+
+
+def status_block(status):
+    return ('<div class="row"><div class="col-md-12">\n<label class="lbl-status">Status</label>\n'
+            f'<p class="status-text">{status}</p>\n</div></div>')
+
+
+def scans(n, latest, status, rng):
+    # Newest first, SCAN_STEP minutes apart, going back from `latest`
+    rows = []
+    for i in range(n):
+        at = latest - timedelta(minutes=SCAN_STEP * i)
+        details = status if i == 0 else rng.choice(DETAILS)
+        rows.append((rng.choice(LOCATIONS), details, at.strftime("%d %b %Y"), at.strftime("%H:%M")))
+    return rows
+
+
+def page(tid, status, details, scan_rows, status_after_scans=False):
+    ship = "\n".join(f'<tr>\n<th scope="row">{key} :</th>\n<td>{value}</td>\n</tr>' for key, value in details)
+    scan = "\n".join("<tr>\n" + "\n".join(f"<td>{cell}</td>" for cell in row) + "\n</tr>" for row in scan_rows)
+    parts = [HEAD]
+    if not status_after_scans: parts.append(status_block(status))
+    parts += [
+        f'<ul class="nav nav-tabs"><li class="active"><a data-toggle="tab" href="#SHIP{tid}">Shipment Details</a></li>'
+        f'<li><a data-toggle="tab" href="#SCAN{tid}">Status and Scans</a></li></ul>',
+        '<div class="tab-content">',
+        f'<div id="SHIP{tid}" class="tab-pane fade in active">\n<div class="table-responsive">\n'
+        f'<table class="table table-bordered table-striped">\n<tbody>\n{ship}\n</tbody>\n</table>\n</div>\n</div>',
+        f'<div id="SCAN{tid}" class="tab-pane fade">\n<div class="table-responsive">\n<table class="table table-bordered">\n'
+        '<thead>\n<tr><th>Location</th><th>Details</th><th>Date</th><th>Time</th></tr>\n'
+        '<tr><th>&nbsp;</th><th>&nbsp;</th><th>&nbsp;</th><th>24 Hr Format</th></tr>\n</thead>\n'
+        f'<tbody>\n{scan}\n</tbody>\n</table>\n</div>\n</div>',
+        '</div>',
+    ]
+    if status_after_scans: parts.append(status_block(status))
+    parts += ['</div>', FOOT]
+    return "\n".join(parts)
+
+
+def shipment_details(tid, status, delivered=None, recipient=""):
+    return [("Waybill No", tid), ("Pickup Date", "14 Jan 2026"), ("From", "MUMBAI"), ("To", "NEW DELHI"),
+            ("Status", status),
+            ("Date of Delivery", delivered.strftime("%d %b %Y") if delivered else ""),
+            ("Time of Delivery", delivered.strftime("%H:%M") if delivered else ""),
+            ("Recipient", recipient), ("Reference No", f"ORD-88213-{tid[-4:]}")]
+
+
+def main():
+    rng = random.Random(4)
+    delivered_at = datetime(2026, 1, 20, 14, 32)
+    latest = datetime(2026, 1, 20, 23, 0)
+    pages = {
+        "bluedart_delivered.html": page(
+            "76543210987", "Shipment Delivered",
+            shipment_details("76543210987", "Shipment Delivered", delivered_at, "RAHUL K"),
+            scans(24, delivered_at, "Shipment Delivered", rng)),
+        "bluedart_in_transit.html": page(
+            "51234567890", "In Transit. Await delivery information",
+            shipment_details("51234567890", "In Transit. Await delivery information"),
+            scans(9, latest, "Shipment Out For Delivery", rng)),
+        "bluedart_long_history.html": page(
+            "88800011122", "Network Delay, Will Impact Delivery",
+            shipment_details("88800011122", "Network Delay, Will Impact Delivery"),
+            scans(160, latest, "Network Delay, Will Impact Delivery", rng)),
+        # Status label only after the scan table, and no Status row to fall
+        # back on: an early-stopping parse must keep reading to find it
+        "bluedart_status_after_scans.html": page(
+            "61234500017", "Shipment Out For Delivery",
+            [row for row in shipment_details("61234500017", "") if row[0] != "Status"],
+            scans(12, latest, "Shipment Out For Delivery", rng), status_after_scans=True),
+    }
+    for name, html in pages.items():
+        with open(os.path.join(FIXTURES, name), "w", encoding="utf-8", newline="\n") as f:
+            f.write(html)
+        print(f"wrote {name} ({len(html) // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    main()
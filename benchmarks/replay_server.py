@@ -0,0 +1,83 @@
+# Replays the synthetic carrier responses in fixtures/ (see make_fixtures.py)
+# for any tracking number.
+#
+# Used by bench_suite.py, or standalone so the CLI can be pointed at it:
+#
+#   python benchmarks/replay_server.py --port 8808 --latency 0.05 --error-rate 0.01
+#   python track_shipments.py --base-url http://127.0.0.1:8808 --json
+
+import argparse
+import glob
+import json
+import os
+import zlib
+from urllib.parse import parse_qs, urlparse
+
+from stub_server import StubHandler, StubServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures(pattern):
+    paths = sorted(glob.glob(os.path.join(FIXTURES, pattern)))
+    if not paths: raise FileNotFoundError(f"no fixtures matching {pattern} in {FIXTURES}")
+    return [open(path, "rb").read() for path in paths]
+
+
+def pick(fixtures, tid):
+    # Same ID, same recording
+    return fixtures[zlib.crc32(tid.encode("utf-8")) % len(fixtures)]
+
+
+class ReplayHandler(StubHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/trackdartresultthirdparty":
+            self._reply(pick(self.server.bluedart, query.get("trackNo", [""])[0]), "text/html; charset=utf-8")
+        elif url.path == "/v3/unified-tracking":
+            shipments = []
+            for tid in query.get("wbn", [""])[0].split(","):
+                if tid: shipments.append(dict(pick(self.server.delhivery, tid), awb=tid))
+            self._reply(json.dumps({"data": shipments, "statusCode": 200}), "application/json")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if urlparse(self.path).path == "/wp-json/custom/v1/domestic/track":
+            self._reply(pick(self.server.dtdc, str(payload.get("trackNumber"))), "application/json")
+        else:
+            self.send_error(404)
+
+
+class ReplayServer(StubServer):
+    handler = ReplayHandler
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.httpd.bluedart = load_fixtures("bluedart_*.html")
+        self.httpd.dtdc = load_fixtures("dtdc_*.json")
+        self.httpd.delhivery = [json.loads(raw)["data"][0] for raw in load_fixtures("delhivery_*.json")]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.0, help="Base delay per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random delay (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction answered with a 429")
+    args = parser.parse_args()
+    server = ReplayServer(latency=args.latency, jitter=args.jitter, port=args.port,
+                          error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    print(f"Replaying fixtures on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Local stand-in for the three carrier endpoints, used by the benchmarks.
+#
+#   server = StubServer(latency=0.05).start()
+#   server.redirect_trackers()   # point every Tracker subclass at it
+#   ...
+#   server.stop()
+#
+# Faults can be injected per request: error_rate (500), throttle_rate (429 with
+# Retry-After), drop_rate (connection closed without a reply) and down (every
+# request gets a 503). They can be changed while the server runs. `missing` is
+# a set of Delhivery waybills answered with no data.
+
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import track_shipments  # noqa: E402
+
+BLUEDART_PAGE = """<html><body>
+<label>Status</label><p>In Transit</p>
+<div id="SHIP{tid}"><table>
+<tr><th>Waybill No</th><td>{tid}</td></tr>
+<tr><th>Status</th><td>In Transit</td></tr>
+<tr><th>Recipient</th><td>N/A</td></tr>
+</table></div>
+<div id="SCAN{tid}"><table>
+<tr><th>Location</th><th>Details</th><th>Date</th><th>Time</th></tr>
+<tr><td>MUMBAI HUB</td><td>Shipment Picked Up</td><td>05 Jan 2026</td><td>10:20</td></tr>
+</table></div>
+</body></html>"""
+
+
+def dtdc_payload(tid):
+    return {
+        "header": {"currentStatusDescription": "In Transit", "originCity": "MUMBAI",
+                   "destinationCity": "DELHI", "noOfPieces": 1, "serviceName": "PRIORITY"},
+        "statuses": [{"statusDescription": "In Transit", "actCityName": "MUMBAI",
+                      "statusTimestamp": "2026-01-05 10:20:00"}],
+    }
+
+
+def delhivery_payload(wbn, missing=()):
+    # One entry per comma-separated waybill, like unified-tracking; waybills in
+    # `missing` are left out, as for IDs the carrier doesn't know
+    return {"data": [{
+        "awb": tid, "consignor": "MUMBAI", "destination": "DELHI", "consignee": "N/A",
+        "status": {"status": "In Transit"},
+        "trackingStates": [{"scans": [{"scannedLocation": "MUMBAI HUB", "scan": "Picked Up",
+                                       "scanDateTime": "2026-01-05T10:20:00"}]}],
+    } for tid in wbn.split(",") if tid and tid not in missing]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _inject_fault(self):
+        # True if a fault was served instead of the real reply
+        faults = self.server.faults
+        roll = self.server.random.random()
+        if faults["down"]:
+            self.send_error(503)
+        elif roll < faults["drop_rate"]:
+            self.close_connection = True
+        elif roll < faults["drop_rate"] + faults["throttle_rate"]:
+            self.send_response(429)
+            self.send_header("Retry-After", str(faults["retry_after"]))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif roll < faults["drop_rate"] + faults["throttle_rate"] + faults["error_rate"]:
+            self.send_error(500)
+        else:
+            return False
+        self.server.faulted += 1
+        return True
+
+    def _reply(self, body, content_type):
+        delay = self.server.latency
+        if self.server.jitter: delay += self.server.random.uniform(0, self.server.jitter)
+        time.sleep(delay)
+        self.server.hits += 1
+        if self._inject_fault(): return
+        if isinstance(body, str): body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/trackdartresultthirdparty":
+            self._reply(BLUEDART_PAGE.format(tid=query.get("trackNo", [""])[0]), "text/html")
+        elif url.path == "/v3/unified-tracking":
+            self._reply(json.dumps(delhivery_payload(query.get("wbn", [""])[0], self.server.faults["missing"])), "application/json")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if urlparse(self.path).path == "/wp-json/custom/v1/domestic/track":
+            self._reply(json.dumps(dtdc_payload(payload.get("trackNumber"))), "application/json")
+        else:
+            self.send_error(404)
+
+
+class StubServer:
+    handler = StubHandler
+
+    def __init__(self, latency=0.0, port=0, seed=None, jitter=0.0, **faults):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self.handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.hits = 0
+        self.httpd.faulted = 0
+        self.httpd.connections = 0
+        self.httpd.random = random.Random(seed)
+        self.httpd.faults = {"error_rate": 0.0, "throttle_rate": 0.0, "drop_rate": 0.0,
+                             "down": False, "retry_after": 1, "missing": set()}
+        self.set_faults(**faults)
+        self.thread = None
+
+    def set_faults(self, **faults):
+        unknown = faults.keys() - self.httpd.faults.keys()
+        if unknown: raise TypeError(f"unknown faults: {', '.join(sorted(unknown))}")
+        self.httpd.faults.update(faults)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def hits(self):
+        return self.httpd.hits
+
+    @property
+    def faulted(self):
+        return self.httpd.faulted
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def redirect_trackers(self):
+        track_shipments.set_base_url(self.url)
@@ -1,22 +1,766 @@
-import urllib.request
-import urllib.error
+import zlib
+import codecs
+import threading
+import functools
+import atexit
+import sqlite3
 import json
+import re
+import itertools
 import sys
 import argparse
 import os
-import curses
 import time
-from html.parser import HTMLParser
+import operator
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+# Everything heavier (the networking stack, http.server, html.parser, curses,
+# concurrent.futures, gzip, csv, ...) is imported inside the functions that
+# use it, so --add/--delete/--find only pay for the store.
+try:
+    import fcntl
+except ImportError:  # not on Windows; locking is then in-process only
+    fcntl = None
+
+# --- METRICS ---
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+METRIC_HELP = {
+    "tracker_phase_seconds": ("histogram", "Time per request phase (dns, connect, tls, ttfb, body, parse) by courier"),
+    "tracker_requests_total": ("counter", "Upstream HTTP requests sent, by courier"),
+    "tracker_response_bytes_total": ("counter", "Response body bytes received on the wire, by courier"),
+    "tracker_errors_total": ("counter", "Failed lookups by courier and error class"),
+    "tracker_coalesced_total": ("counter", "Lookups that joined an identical request already in flight, by courier"),
+    "store_operation_seconds": ("histogram", "Time spent in tracking store operations, by operation"),
+}
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]: i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max: self.max = value
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket, like Prometheus' histogram_quantile
+        if not self.count: return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = self.buckets[i - 1] if i else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+class Metrics:
+    # Process-wide histograms and counters keyed by (name, sorted labels)
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None: hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def prometheus(self):
+        # Prometheus text exposition format
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs: return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines, described = [], set()
+        def describe(name):
+            if name in described: return
+            described.add(name)
+            kind, text = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+        for (name, labels), hist in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, n in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{fmt(labels)} {hist.sum}")
+            lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{fmt(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Atomic, for node_exporter's textfile collector
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def summary(self):
+        # Human-readable digest for --stats
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        def ms(v): return f"{v * 1000:8.1f}ms"
+        lines = []
+        couriers = sorted({dict(l).get("courier") for (_, l) in list(histograms) + list(counters)} - {None})
+        for courier in couriers:
+            requests = counters.get(("tracker_requests_total", (("courier", courier),)), 0)
+            size = counters.get(("tracker_response_bytes_total", (("courier", courier),)), 0)
+            errors = {dict(l)["kind"]: n for (name, l), n in counters.items()
+                      if name == "tracker_errors_total" and dict(l).get("courier") == courier}
+            coalesced = counters.get(("tracker_coalesced_total", (("courier", courier),)), 0)
+            error_text = ", ".join(f"{k}={n}" for k, n in sorted(errors.items())) or "none"
+            lines.append(f"{courier}: {requests} requests, {coalesced} coalesced, {size / 1024:.1f} KiB, errors: {error_text}")
+            for phase in ("dns", "connect", "tls", "ttfb", "body", "parse"):
+                hist = histograms.get(("tracker_phase_seconds", (("courier", courier), ("phase", phase))))
+                if hist and hist.count:
+                    lines.append(f"  {phase:<8} n={hist.count:<6} p50{ms(hist.quantile(0.5))}  "
+                                 f"p99{ms(hist.quantile(0.99))}  total{ms(hist.sum)}")
+        store_ops = sorted((dict(l)["op"], h) for (name, l), h in histograms.items() if name == "store_operation_seconds")
+        if store_ops:
+            lines.append("store:")
+            for op, hist in store_ops:
+                lines.append(f"  {op:<16} n={hist.count:<6} p50{ms(hist.quantile(0.5))}  "
+                             f"p99{ms(hist.quantile(0.99))}  total{ms(hist.sum)}")
+        return "\n".join(lines)
+
+METRICS = Metrics()
+
+def export_metrics(stats=False, metrics_file=None):
+    if metrics_file: METRICS.write_prometheus(metrics_file)
+    if stats:
+        text = METRICS.summary()
+        if text: print(text, file=sys.stderr)
+
+def timed(name, **labels):
+    # Decorator form of METRICS.timer
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# --- HTTP TRANSPORT ---
+
+class TimedConnectionMixin:
+    # Records DNS, TCP connect and (for HTTPS) TLS handshake time per courier.
+    # The courier label is set by the tracker before each request.
+    courier = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = self._timed_create_connection
+        self._setup_seconds = 0.0
+
+    def _timed_create_connection(self, address, timeout, source_address=None):
+        import socket
+        host, port = address
+        start = time.perf_counter()
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        METRICS.observe("tracker_phase_seconds", resolved - start, courier=self.courier, phase="dns")
+        error = None
+        for _, _, _, _, sockaddr in infos:
+            try:
+                sock = socket.create_connection((sockaddr[0], port), timeout, source_address)
+                break
+            except OSError as e:
+                error = e
+        else:
+            raise error or OSError(f"could not resolve {host}")
+        connected = time.perf_counter()
+        METRICS.observe("tracker_phase_seconds", connected - resolved, courier=self.courier, phase="connect")
+        self._setup_seconds = connected - start
+        return sock
+
+class TimedTLSMixin(TimedConnectionMixin):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        METRICS.observe("tracker_phase_seconds", time.perf_counter() - start - self._setup_seconds,
+                        courier=self.courier, phase="tls")
+
+@functools.lru_cache(maxsize=None)
+def timed_connection_class(scheme):
+    # Built on first use, so commands that never fetch don't import http.client
+    import http.client
+    if scheme == "https": return type("TimedHTTPSConnection", (TimedTLSMixin, http.client.HTTPSConnection), {})
+    return type("TimedHTTPConnection", (TimedConnectionMixin, http.client.HTTPConnection), {})
+
+class ConnectionPool:
+    # Idle keep-alive connections per (scheme, host, port), shared across threads.
+    # A connection is only ever used by one request at a time; it goes back to
+    # the pool once its response has been read to the end.
+    def __init__(self, max_idle_per_host=16, timeout=15):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = None
+
+    def acquire(self, key):
+        # Returns (connection, reused)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle: return idle.pop(), True
+        return self._connect(key), False
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns: conn.close()
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl_context is None:
+                import ssl
+                self._ssl_context = ssl.create_default_context()
+            return timed_connection_class(scheme)(host, port, timeout=self.timeout, context=self._ssl_context)
+        return timed_connection_class(scheme)(host, port, timeout=self.timeout)
+
+class PooledResponse:
+    # Response body reader that transparently undoes gzip/deflate
+    def __init__(self, response):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.wire_bytes = 0
+        self.read_seconds = 0.0
+        self._response = response
+        encoding = (response.getheader("Content-Encoding") or "").strip().lower()
+        if encoding == "gzip": self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate": self._decoder = zlib.decompressobj()
+        else: self._decoder = None
+
+    @property
+    def complete(self):
+        return self._response.isclosed()
+
+    def read(self):
+        start = time.perf_counter()
+        body = self._response.read()
+        self.read_seconds += time.perf_counter() - start
+        self.wire_bytes += len(body)
+        if self._decoder: body = self._decoder.decompress(body) + self._decoder.flush()
+        return body
+
+    def iter_chunks(self, size=16384):
+        # Decoded body pieces as they come off the socket
+        while True:
+            start = time.perf_counter()
+            chunk = self._response.read1(size)
+            self.read_seconds += time.perf_counter() - start
+            self.wire_bytes += len(chunk)
+            if not chunk: break
+            if self._decoder: chunk = self._decoder.decompress(chunk)
+            if chunk: yield chunk
+        if self._decoder:
+            tail = self._decoder.flush()
+            if tail: yield tail
+
+    def drain(self, limit):
+        # Discard the unread rest of the body if it is known to be at most
+        # limit bytes, so the connection can go back to the pool.
+        remaining = self._response.length
+        if remaining is None or remaining > limit: return False
+        try:
+            self._response.read()
+        except Exception:
+            return False
+        return self.complete
+
+@functools.lru_cache(maxsize=None)
+def stale_connection_errors():
+    # Raised on a reused socket that the server already closed; safe to resend
+    import http.client
+    return (http.client.RemoteDisconnected, http.client.BadStatusLine,
+            ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Unread body bytes worth draining to keep a connection when a caller stops early
+DRAIN_LIMIT = 64 * 1024
+
+# --- RESILIENCE POLICY ---
+
+class TrackerError(Exception):
+    kind = "permanent"
+
+class PermanentError(TrackerError):
+    # Bad ID, unparseable response, 4xx: retrying won't help
+    kind = "permanent"
+
+class TransientError(TrackerError):
+    # Timeouts, connection failures, 5xx: worth retrying
+    kind = "transient"
+
+class ThrottledError(TransientError):
+    # The carrier asked us to slow down (429, or 503 with Retry-After)
+    kind = "throttled"
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpenError(TransientError):
+    pass
+
+def classify_error(e):
+    # Map anything a fetch can raise onto permanent / transient / throttled
+    if isinstance(e, TrackerError): return e
+    import http.client, urllib.error
+    if isinstance(e, urllib.error.HTTPError):
+        retry_after = None
+        try: retry_after = float(e.headers.get("Retry-After"))
+        except (TypeError, ValueError, AttributeError): pass
+        if e.code == 429 or (e.code == 503 and retry_after is not None):
+            return ThrottledError(str(e), retry_after)
+        if e.code >= 500 or e.code == 408: return TransientError(str(e))
+        return PermanentError(str(e))
+    if isinstance(e, (urllib.error.URLError, OSError, http.client.HTTPException)):
+        return TransientError(str(e))
+    return PermanentError(str(e))
+
+class TokenBucket:
+    # `rate` requests per second on average, bursts of up to `burst`
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Spend ahead so nothing goes out for `seconds` (used on throttling)
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive transient failures; while open every
+    # call fails fast. After `reset_timeout` one trial call is let through.
+    def __init__(self, threshold=5, reset_timeout=60):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None: return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial: return False
+            self._trial = True
+            return True
+
+    def retry_in(self):
+        if self.opened_at is None: return 0
+        return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+class CourierPolicy:
+    # Rate limit, retry with jittered exponential backoff and circuit breaker
+    # around one carrier's fetches
+    def __init__(self, name, rate, burst, max_retries=3, base_delay=0.5, max_delay=30,
+                 failure_threshold=5, reset_timeout=60):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt, error):
+        import random
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if isinstance(error, ThrottledError) and error.retry_after:
+            delay = max(delay, min(self.max_delay, error.retry_after))
+        return delay
+
+    def call(self, fn, *args):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} circuit open, retrying in {self.breaker.retry_in():.0f}s")
+            self.bucket.acquire()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                error = classify_error(e)
+                if not isinstance(error, TransientError):
+                    self.breaker.record_success() # the carrier answered
+                    raise error from e
+                self.breaker.record_failure()
+                if isinstance(error, ThrottledError) and error.retry_after:
+                    self.bucket.pause(min(self.max_delay, error.retry_after))
+                if attempt == self.max_retries: raise error from e
+                time.sleep(self.backoff(attempt, error))
+                continue
+            self.breaker.record_success()
+            return result
+
+# Per-carrier limits: requests/second, burst size
+COURIER_POLICY = {
+    "Blue Dart": {"rate": 5, "burst": 10},
+    "DTDC": {"rate": 5, "burst": 10},
+    "Delhivery": {"rate": 10, "burst": 20}
+}
+_policies = {}
+_policies_lock = threading.Lock()
+
+def get_policy(courier):
+    with _policies_lock:
+        if courier not in _policies:
+            _policies[courier] = CourierPolicy(courier, **COURIER_POLICY.get(courier, {"rate": 2, "burst": 4}))
+        return _policies[courier]
+
+# --- SHIPMENT MODEL ---
+
+# Carriers report local (IST) wall-clock times without a zone
+CARRIER_UTC_OFFSET = 19800
+SCAN_DATE_FORMATS = ("%Y-%m-%d", "%d %b %Y", "%d-%m-%Y", "%d/%m/%Y", "%d-%b-%Y", "%d %B %Y")
+
+@functools.lru_cache(maxsize=8192)
+def _scan_day(date):
+    # Epoch of midnight (as if UTC) for a carrier date string, or None
+    import calendar
+    for fmt in SCAN_DATE_FORMATS:
+        try: return calendar.timegm(time.strptime(date, fmt))
+        except ValueError: pass
+    return None
+
+@functools.lru_cache(maxsize=1 << 17)
+def _scan_seconds(clock):
+    # "23:00", "20:00:00", "2300" -> seconds since midnight
+    digits = clock.replace(":", "")[:6]
+    if not digits.isdigit() or len(digits) < 4: return 0
+    return int(digits[:2]) * 3600 + int(digits[2:4]) * 60 + int(digits[4:6] or 0)
+
+def scan_epoch(date, clock):
+    # Integer UTC timestamp of a scan, None if the date can't be parsed
+    day = _scan_day(date.strip()) if date else None
+    if day is None: return None
+    return day + _scan_seconds(clock.strip() if clock else "") - CARRIER_UTC_OFFSET
+
+def scan_epochs(dates, clocks):
+    # Column form of scan_epoch: the date and time parses are cached per
+    # distinct string, so only the addition runs per event
+    days = map(_scan_day, map(str, dates))
+    seconds = map(_scan_seconds, map(str, clocks))
+    return [None if day is None else day + sec - CARRIER_UTC_OFFSET for day, sec in zip(days, seconds)]
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class ScanEvent(Mapping):
+    # One scan. Strings are interned (locations, remarks and dates repeat across
+    # thousands of shipments) and `at` is parsed once. Reads like the dict the
+    # trackers used to return, with exactly its keys.
+    __slots__ = ("location", "details", "date", "time", "at")
+    FIELDS = ("location", "details", "date", "time")
+
+    def __init__(self, location="", details="", date="", time=""):
+        self.location = _intern(location)
+        self.details = _intern(details)
+        self.date = _intern(date)
+        self.time = _intern(time)
+        self.at = scan_epoch(date, time)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS: raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"ScanEvent({self.location!r}, {self.details!r}, {self.date!r}, {self.time!r})"
+
+    def as_dict(self):
+        return {"location": self.location, "details": self.details, "date": self.date, "time": self.time}
+
+    @classmethod
+    def from_dict(cls, scan):
+        return cls(scan.get("location", ""), scan.get("details", ""), scan.get("date", ""), scan.get("time", ""))
+
+class Shipment(Mapping):
+    # A successful lookup as returned by every tracker. Behaves as a read-only
+    # mapping with the legacy result keys so existing callers keep working;
+    # as_dict() gives the plain dict used for --json and the cache file.
+    __slots__ = ("status", "delivery_details", "scans", "courier", "tracking_number")
+    FIELDS = ("status", "delivery_details", "scans", "courier", "tracking_number")
+
+    def __init__(self, status, delivery_details, scans, courier, tracking_number):
+        self.status = _intern(status)
+        self.delivery_details = {_intern(k): _intern(v) for k, v in delivery_details.items()}
+        self.scans = scans
+        self.courier = _intern(courier)
+        self.tracking_number = tracking_number
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS: raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"Shipment({self.courier!r}, {self.tracking_number!r}, {self.status!r}, {len(self.scans)} scans)"
+
+    @property
+    def last_scan_at(self):
+        return max((scan.at for scan in self.scans if scan.at is not None), default=None)
+
+    def as_dict(self):
+        return {"status": self.status, "delivery_details": dict(self.delivery_details),
+                "scans": [scan.as_dict() for scan in self.scans],
+                "courier": self.courier, "tracking_number": self.tracking_number}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("status"), data.get("delivery_details") or {},
+                   [ScanEvent.from_dict(scan) for scan in data.get("scans") or []],
+                   data.get("courier"), data.get("tracking_number"))
+
+def json_default(obj):
+    # json.dumps(..., default=json_default) for results that hold model objects
+    if isinstance(obj, (Shipment, ScanEvent)): return obj.as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 # --- TRACKER CLASSES ---
 
 class Tracker:
+    courier = None
+    pool = ConnectionPool()
+    # Most IDs one upstream request can look up; carriers that take several
+    # override this and _fetch_many()
+    max_batch = 1
+
     def get_details(self, tracking_number):
+        # Never raises: failures come back as {"error", "courier", "error_class"}
+        try:
+            return get_policy(self.courier).call(self._fetch, tracking_number)
+        except TrackerError as e:
+            METRICS.inc("tracker_errors_total", courier=self.courier, kind=e.kind)
+            return {"error": str(e), "courier": self.courier, "error_class": e.kind}
+
+    def get_details_many(self, tracking_numbers):
+        # {tid: data} for every ID, using as few upstream requests as the
+        # carrier allows; falls back to one get_details() per ID
+        tracking_numbers = list(dict.fromkeys(tracking_numbers))
+        if self.max_batch <= 1:
+            return {tid: self.get_details(tid) for tid in tracking_numbers}
+        results = {}
+        for i in range(0, len(tracking_numbers), self.max_batch):
+            chunk = tracking_numbers[i:i + self.max_batch]
+            try:
+                answered = get_policy(self.courier).call(self._fetch_many, chunk)
+            except TrackerError as e:
+                METRICS.inc("tracker_errors_total", len(chunk), courier=self.courier, kind=e.kind)
+                for tid in chunk: results[tid] = {"error": str(e), "courier": self.courier, "error_class": e.kind}
+                continue
+            # IDs the answer had no data for count like failed single lookups;
+            # batch misses are looked up again, and counted there if they fail
+            for result in answered.values():
+                if result.get("error") and not result.get("batch_miss"):
+                    METRICS.inc("tracker_errors_total", courier=self.courier, kind=result.get("error_class", "permanent"))
+            results.update(answered)
+        return results
+
+    def parse_file(self, path, tracking_number):
+        # Parse a saved response body instead of fetching; same result shape as
+        # get_details()
+        try:
+            with open(path, 'rb') as f:
+                return self.parse(f.read(), tracking_number)
+        except Exception as e:
+            e = classify_error(e)
+            return {"error": str(e), "courier": self.courier, "error_class": e.kind}
+
+    def parse(self, body, tracking_number):
+        # Turn one raw response body into the normalized result dict
+        with METRICS.timer("tracker_phase_seconds", courier=self.courier, phase="parse"):
+            return self._parse(body, tracking_number)
+
+    def _parse(self, body, tracking_number):
         raise NotImplementedError
 
-class BlueDartParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
+    def _keep(self, body, tracking_numbers):
+        # Save the raw body for --reparse when --keep-raw is on
+        if RAW_ARCHIVE is not None: RAW_ARCHIVE.put(self.courier, tracking_numbers, body)
+
+    def _fetch(self, tracking_number):
+        # Fetch and parse one shipment, raising on any failure
+        raise NotImplementedError
+
+    def _fetch_many(self, tracking_numbers):
+        # One upstream request for up to max_batch IDs -> {tid: data}
+        raise NotImplementedError
+
+    @contextmanager
+    def _open(self, url, headers=None, data=None, method=None, max_redirects=5):
+        # Pooled replacement for urllib.request.urlopen. Yields a PooledResponse;
+        # HTTP errors raise urllib.error.HTTPError like urlopen does.
+        import urllib.error, urllib.parse
+        method = method or ("POST" if data is not None else "GET")
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip, deflate")
+        for _ in range(max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            path = parts.path or "/"
+            if parts.query: path += "?" + parts.query
+            conn, response = self._send(key, method, path, data, headers)
+
+            if response.status in REDIRECT_CODES and response.getheader("Location"):
+                response.read()
+                self._finish(key, conn, response)
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                if response.status == 303 or (response.status in (301, 302) and method == "POST"):
+                    method, data = "GET", None
+                continue
+
+            wrapped = PooledResponse(response)
+            try:
+                if response.status >= 400:
+                    wrapped.read()
+                    raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+                yield wrapped
+            finally:
+                METRICS.observe("tracker_phase_seconds", wrapped.read_seconds, courier=self.courier, phase="body")
+                METRICS.inc("tracker_response_bytes_total", wrapped.wire_bytes, courier=self.courier)
+                if wrapped.complete or wrapped.drain(DRAIN_LIMIT): self._finish(key, conn, response)
+                else: conn.close()
+            return
+        raise urllib.error.URLError(f"too many redirects for {url}")
+
+    def _request(self, url, headers=None, data=None, method=None):
+        with self._open(url, headers=headers, data=data, method=method) as response:
+            return response.read()
+
+    def _send(self, key, method, path, data, headers):
+        import urllib.error
+        conn, reused = self.pool.acquire(key)
+        try:
+            try:
+                return conn, self._roundtrip(conn, method, path, data, headers)
+            except stale_connection_errors():
+                if not reused: raise
+            # The server dropped the idle socket; retry once on a fresh one
+            conn.close()
+            conn = self.pool._connect(key)
+            return conn, self._roundtrip(conn, method, path, data, headers)
+        except OSError as e:
+            conn.close()
+            if isinstance(e, urllib.error.URLError): raise
+            raise urllib.error.URLError(e)
+        except Exception:
+            conn.close()
+            raise
+
+    def _roundtrip(self, conn, method, path, data, headers):
+        # Connect explicitly first so time-to-first-byte excludes connection setup
+        conn.courier = self.courier
+        if conn.sock is None: conn.connect()
+        METRICS.inc("tracker_requests_total", courier=self.courier)
+        start = time.perf_counter()
+        conn.request(method, path, body=data, headers=headers)
+        response = conn.getresponse()
+        METRICS.observe("tracker_phase_seconds", time.perf_counter() - start, courier=self.courier, phase="ttfb")
+        return response
+
+    def _finish(self, key, conn, response):
+        if response.will_close: conn.close()
+        else: self.pool.release(key, conn)
+
+class BlueDartParser:
+    # stop_after_scans: ignore everything once the scan table has closed and the
+    # status label has been read (used when streaming, so the rest of the page
+    # need not be read at all). A page whose label comes after the scan table, or
+    # has none, is read on to the end, since the label overrides the Status row.
+    # Drives an html.parser.HTMLParser with the handle_* methods below rather
+    # than subclassing it, so html.parser is only imported once a page is parsed.
+    def __init__(self, stop_after_scans=False):
+        from html.parser import HTMLParser
+        html = HTMLParser()
+        html.handle_starttag, html.handle_endtag, html.handle_data = self.handle_starttag, self.handle_endtag, self.handle_data
+        self.feed, self.close = html.feed, html.close
         self.output = {
             "status": None,
             "delivery_details": {},
@@ -30,22 +774,58 @@ class BlueDartParser(HTMLParser):
         self._current_row = []
         self._in_td = False
         self._in_th = False
+        self._stop_after_scans = stop_after_scans
+        self._scan_table_depth = 0
+        self._scans_closed = False
+        self._label_status_seen = False
+        self.done = False
+        self.parse_seconds = 0.0
+
+    def feed_chunks(self, chunks):
+        # Incremental feed of raw byte chunks. Input is only handed to feed() up
+        # to the last "<" seen so far, so a text node is never split across two
+        # handle_data() calls and the result matches a single feed() of the page.
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        for chunk in chunks:
+            start = time.perf_counter()
+            pending += decoder.decode(chunk)
+            cut = pending.rfind("<")
+            if cut > 0:
+                self.feed(pending[:cut])
+                pending = pending[cut:]
+            self.parse_seconds += time.perf_counter() - start
+            if self.done: return
+        start = time.perf_counter()
+        pending += decoder.decode(b"", final=True)
+        if pending: self.feed(pending)
+        self.parse_seconds += time.perf_counter() - start
 
     def handle_starttag(self, tag, attrs):
+        if self.done: return
         self._current_tag = tag
-        attrs_dict = dict(attrs)
         if tag == "label": self._in_status_label = True
         if tag == "div":
-            if attrs_dict.get("id", "").startswith("SHIP"):
+            div_id = ""
+            for name, value in attrs:
+                if name == "id": div_id = value or ""
+            if div_id.startswith("SHIP"):
                 self._in_shipment_tab = True; self._in_scan_tab = False
-            elif attrs_dict.get("id", "").startswith("SCAN"):
+            elif div_id.startswith("SCAN"):
                 self._in_scan_tab = True; self._in_shipment_tab = False
+        if tag == "table" and self._in_scan_tab: self._scan_table_depth += 1
         if tag == "tr": self._current_row = []
         if tag in ["td", "th"]: self._in_td = True; self._in_th = True
 
     def handle_endtag(self, tag):
+        if self.done: return
         if tag == "label": self._in_status_label = False
         if tag in ["td", "th"]: self._in_td = False; self._in_th = False
+        if tag == "table" and self._in_scan_tab and self._scan_table_depth:
+            self._scan_table_depth -= 1
+            if not self._scan_table_depth:
+                self._scans_closed = True
+                self.done = self._stop_after_scans and self._label_status_seen
         if tag == "tr":
             if self._in_shipment_tab and len(self._current_row) >= 2:
                 raw_key = self._current_row[0]
@@ -58,111 +838,150 @@ class BlueDartParser(HTMLParser):
             elif self._in_scan_tab and len(self._current_row) >= 3:
                 location = self._current_row[0]
                 if "Location" not in location and "24 Hr Format" not in location and "Feedback By" not in location:
-                    scan = {
-                        "location": location,
-                        "details": self._current_row[1] if len(self._current_row) > 1 else "",
-                        "date": self._current_row[2] if len(self._current_row) > 2 else "",
-                        "time": self._current_row[3] if len(self._current_row) > 3 else ""
-                    }
+                    scan = ScanEvent(
+                        location,
+                        self._current_row[1] if len(self._current_row) > 1 else "",
+                        self._current_row[2] if len(self._current_row) > 2 else "",
+                        self._current_row[3] if len(self._current_row) > 3 else ""
+                    )
                     self.output["scans"].append(scan)
 
     def handle_data(self, data):
+        # Text only matters inside a cell, a status label, or the <p> after one
+        if self.done or not (self._in_td or self._in_status_label or self._capture_next_p_as_status): return
         clean_data = data.strip()
         if not clean_data: return
         if self._in_status_label and "Status" in clean_data: self._capture_next_p_as_status = True
         if self._capture_next_p_as_status and self._current_tag == "p":
             self.output["status"] = clean_data; self._capture_next_p_as_status = False
+            self._label_status_seen = True
+            self.done = self._stop_after_scans and self._scans_closed
         if (self._in_td or self._in_th): self._current_row.append(clean_data)
 
 class BlueDartTracker(Tracker):
-    def get_details(self, tracking_number):
-        url = f"https://www.bluedart.com/trackdartresultthirdparty?trackFor=0&trackNo={tracking_number}"
+    courier = "Blue Dart"
+    base_url = "https://www.bluedart.com"
+
+    def _fetch(self, tracking_number):
+        url = f"{self.base_url}/trackdartresultthirdparty?trackFor=0&trackNo={tracking_number}"
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         }
-        try:
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=15) as response:
-                html_content = response.read().decode('utf-8')
-            parser = BlueDartParser()
-            parser.feed(html_content)
-            result = parser.output
-            result["courier"] = "Blue Dart"
-            result["tracking_number"] = tracking_number
-            return result
-        except Exception as e:
-            return {"error": str(e), "courier": "Blue Dart"}
+        with self._open(url, headers=headers) as response:
+            if RAW_ARCHIVE is None: return self._parse_chunks(response.iter_chunks(), tracking_number)
+            # Archiving needs the whole page, not just up to the scan table
+            body = response.read()
+        self._keep(body, [tracking_number])
+        return self.parse(body, tracking_number)
+
+    def parse(self, body, tracking_number):
+        return self._parse_chunks([body], tracking_number)
+
+    def _parse_chunks(self, chunks, tracking_number):
+        parser = BlueDartParser(stop_after_scans=True)
+        parser.feed_chunks(chunks)
+        METRICS.observe("tracker_phase_seconds", parser.parse_seconds, courier=self.courier, phase="parse")
+        result = parser.output
+        return Shipment(result["status"], result["delivery_details"], result["scans"], "Blue Dart", tracking_number)
 
 class DTDCTracker(Tracker):
-    def get_details(self, tracking_number):
-        url = "https://www.dtdc.com/wp-json/custom/v1/domestic/track"
+    courier = "DTDC"
+    base_url = "https://www.dtdc.com"
+
+    def _fetch(self, tracking_number):
+        url = f"{self.base_url}/wp-json/custom/v1/domestic/track"
         headers = {
             "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36"
         }
         payload = json.dumps({"trackType": "cnno", "trackNumber": tracking_number}).encode('utf-8')
-        try:
-            req = urllib.request.Request(url, data=payload, headers=headers, method='POST')
-            with urllib.request.urlopen(req, timeout=15) as response:
-                data = json.loads(response.read().decode('utf-8'))
-            
-            # Parse DTDC specific response
-            events = []
-            status = "Unknown"
-            if data.get("statuses") and isinstance(data["statuses"], list):
-                for event in data["statuses"]:
-                     # Clean remarks (remove HTML tags)
-                     desc = event.get("statusDescription", "")
-                     # Quick and dirty HTML tag removal
-                     desc = desc.replace("<br>", " ").replace("<b>", "").replace("</b>", "")
-                     
-                     events.append({
-                         "location": event.get("actCityName") or event.get("actBranchName") or "N/A",
-                         "details": desc,
-                         "date": event.get("statusTimestamp", "").split()[0] if event.get("statusTimestamp") else "",
-                         "time": event.get("statusTimestamp", "").split()[1] if event.get("statusTimestamp") and len(event.get("statusTimestamp").split()) > 1 else ""
-                     })
-                if events:
-                    status = events[0].get("details", "Unknown") # Latest event is usually first? OR user provided code says first?
-                    # "events.length > 0 ? events[0].status" suggests first one is latest
-            
-            header = data.get("header", {})
-            current_status = header.get("currentStatusDescription") or status
-            
-            # DTDC checks
-            is_delivered = "Delivered" in current_status or "Successful" in current_status
-            if is_delivered and "Delivered" not in current_status:
-                 current_status += " (Delivered)" # Normalize for UI check
-            
-            delivery_details = {
-                "Origin": header.get("originCity"),
-                "Destination": header.get("destinationCity"),
-                "Pieces": header.get("noOfPieces"),
-                "Service": header.get("serviceName"),
-                "Date of Delivery": "N/A", # DTDC might not provide this explicitly in header
-                "Recipient": "N/A"
-            }
-            
-            return {
-                "status": current_status,
-                "delivery_details": delivery_details,
-                "scans": events,
-                "courier": "DTDC",
-                "tracking_number": tracking_number
-            }
-        except Exception as e:
-             return {"error": str(e), "courier": "DTDC"}
+        body = self._request(url, headers=headers, data=payload, method='POST')
+        self._keep(body, [tracking_number])
+        return self.parse(body, tracking_number)
+
+    def _parse(self, body, tracking_number):
+        data = json.loads(body.decode('utf-8'))
+        
+        # Parse DTDC specific response
+        events = []
+        status = "Unknown"
+        if data.get("statuses") and isinstance(data["statuses"], list):
+            for event in data["statuses"]:
+                 # Clean remarks (remove HTML tags)
+                 desc = event.get("statusDescription", "")
+                 # Quick and dirty HTML tag removal
+                 desc = desc.replace("<br>", " ").replace("<b>", "").replace("</b>", "")
+                 
+                 events.append(ScanEvent(
+                     event.get("actCityName") or event.get("actBranchName") or "N/A",
+                     desc,
+                     event.get("statusTimestamp", "").split()[0] if event.get("statusTimestamp") else "",
+                     event.get("statusTimestamp", "").split()[1] if event.get("statusTimestamp") and len(event.get("statusTimestamp").split()) > 1 else ""
+                 ))
+            if events:
+                status = events[0].get("details", "Unknown") # Latest event is usually first? OR user provided code says first?
+                # "events.length > 0 ? events[0].status" suggests first one is latest
+        
+        header = data.get("header", {})
+        current_status = header.get("currentStatusDescription") or status
+        
+        # DTDC checks
+        is_delivered = "Delivered" in current_status or "Successful" in current_status
+        if is_delivered and "Delivered" not in current_status:
+             current_status += " (Delivered)" # Normalize for UI check
+        
+        delivery_details = {
+            "Origin": header.get("originCity"),
+            "Destination": header.get("destinationCity"),
+            "Pieces": header.get("noOfPieces"),
+            "Service": header.get("serviceName"),
+            "Date of Delivery": "N/A", # DTDC might not provide this explicitly in header
+            "Recipient": "N/A"
+        }
+        
+        return Shipment(current_status, delivery_details, events, "DTDC", tracking_number)
 
 class DelhiveryTracker(Tracker):
-    def get_details(self, tracking_number):
+    courier = "Delhivery"
+    base_url = "https://dlv-api.delhivery.com"
+
+    # unified-tracking takes a comma-separated list of waybills. That form, and
+    # matching its answers back by awb/waybill, is only known from the API
+    # notes and our stub server, so any ID a batch answer leaves out is looked
+    # up again on its own (see get_details_many)
+    max_batch = 25
+
+    def get_details_many(self, tracking_numbers):
+        results = super().get_details_many(tracking_numbers)
+        missed = [tid for tid, result in results.items() if result.get("batch_miss")]
+        if missed:
+            METRICS.inc("tracker_batch_misses_total", len(missed), courier=self.courier)
+            for tid in missed: results[tid] = self.get_details(tid)
+        return results
+
+    def _fetch(self, tracking_number):
+        result = self._fetch_many([tracking_number])[tracking_number]
+        if result.get("error"): raise PermanentError(result["error"])
+        return result
+
+    def _parse(self, body, tracking_number):
+        result = self._parse_many(body, [tracking_number])[tracking_number]
+        if result.get("error"): raise PermanentError(result["error"])
+        return result
+
+    def parse_many(self, body, tracking_numbers):
+        with METRICS.timer("tracker_phase_seconds", courier=self.courier, phase="parse"):
+            return self._parse_many(body, tracking_numbers)
+
+    def _fetch_many(self, tracking_numbers):
         # NOTE: The provided doc says `https://dlv-api.delhivery.com/v3/unified-tracking`
         # But also mentions a proxy in supabase. Let's try direct API first as per doc?
         # Actually doc "DELHIVERY_API_INTEGRATION.md" says:
         # Headers: Host: dlv-api.delhivery.com ...
         # Endpoint: https://dlv-api.delhivery.com/v3/unified-tracking?wbn=...
         
-        url = f"https://dlv-api.delhivery.com/v3/unified-tracking?wbn={tracking_number}"
+        url = f"{self.base_url}/v3/unified-tracking?wbn={','.join(tracking_numbers)}"
         headers = {
             "Host": "dlv-api.delhivery.com",
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36",
@@ -170,57 +989,70 @@ class DelhiveryTracker(Tracker):
             "Origin": "https://www.delhivery.com",
             "Accept": "application/json, text/plain, */*"
         }
-        try:
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=15) as response:
-                data = json.loads(response.read().decode('utf-8'))
-            
-            # Parse Delhivery response
-            # data.data[0] contains shipment info
-            if not data.get("data"):
-                 return {"error": "No data found", "courier": "Delhivery"}
-            
-            shipment = data["data"][0]
-            events = []
-            
-            # Parsing logic adapted from typescript file
-            if shipment.get("trackingStates"):
-                 for ts in shipment["trackingStates"]:
-                     if ts.get("scans"):
-                         for scan in ts["scans"]:
-                             events.append({
-                                 "location": scan.get("scannedLocation") or scan.get("cityLocation") or "N/A",
-                                 "details": scan.get("scanNslRemark") or scan.get("scan") or "Scan",
-                                 "date": (scan.get("scanDateTime") or "").split("T")[0],
-                                 "time": (scan.get("scanDateTime") or "").split("T")[-1][:5] # Simple slice
-                             })
-            
-            # Sort events desc? They might come sorted.
-            
-            delivery_details = {
-                "Origin": shipment.get("consignor"),
-                "Destination": shipment.get("destination"),
-                "Expected Delivery": shipment.get("deliveryDate"),
-                "Recipient": shipment.get("consignee")
-            }
-            
-            status = "Unknown"
-            if shipment.get("status"):
-                 status = shipment["status"].get("status") or shipment["status"].get("statusType")
-            
-            return {
-                "status": status,
-                "delivery_details": delivery_details,
-                "scans": events,
-                "courier": "Delhivery",
-                "tracking_number": tracking_number
-            }
-        except Exception as e:
-            return {"error": str(e), "courier": "Delhivery"}
+        body = self._request(url, headers=headers)
+        self._keep(body, tracking_numbers)
+        return self.parse_many(body, tracking_numbers)
+
+    def _parse_many(self, body, tracking_numbers):
+        data = json.loads(body.decode('utf-8'))
+        
+        # Parse Delhivery response
+        # data.data holds one entry per waybill found, tagged with its awb
+        shipments = data.get("data") or []
+        if len(tracking_numbers) == 1 and shipments:
+            by_id = {tracking_numbers[0]: shipments[0]}
+        else:
+            by_id = {str(s.get("awb") or s.get("waybill")): s for s in shipments}
+
+        results = {}
+        for tid in tracking_numbers:
+            if tid in by_id: results[tid] = self._parse_shipment(by_id[tid], tid)
+            else: results[tid] = {"error": "No data found", "courier": "Delhivery", "error_class": "permanent"}
+            # Missing from a multi-ID answer may just mean it was keyed some other way
+            if tid not in by_id and len(tracking_numbers) > 1: results[tid]["batch_miss"] = True
+        return results
+
+    def _parse_shipment(self, shipment, tracking_number):
+        events = []
+        
+        # Parsing logic adapted from typescript file
+        if shipment.get("trackingStates"):
+             for ts in shipment["trackingStates"]:
+                 if ts.get("scans"):
+                     for scan in ts["scans"]:
+                         events.append(ScanEvent(
+                             scan.get("scannedLocation") or scan.get("cityLocation") or "N/A",
+                             scan.get("scanNslRemark") or scan.get("scan") or "Scan",
+                             (scan.get("scanDateTime") or "").split("T")[0],
+                             (scan.get("scanDateTime") or "").split("T")[-1][:5] # Simple slice
+                         ))
+        
+        # Sort events desc? They might come sorted.
+        
+        delivery_details = {
+            "Origin": shipment.get("consignor"),
+            "Destination": shipment.get("destination"),
+            "Expected Delivery": shipment.get("deliveryDate"),
+            "Recipient": shipment.get("consignee")
+        }
+        
+        status = "Unknown"
+        if shipment.get("status"):
+             status = shipment["status"].get("status") or shipment["status"].get("statusType")
+        
+        return Shipment(status, delivery_details, events, "Delhivery", tracking_number)
 
 # --- MAIN APP LOGIC ---
 
 TRACKING_FILE = "tracking_list_v2.json"
+COURIERS = ["Blue Dart", "DTDC", "Delhivery"]
+
+def set_base_url(url):
+    # Point every tracker at one host (a local replay server) instead of the carriers
+    for cls in (BlueDartTracker, DTDCTracker, DelhiveryTracker):
+        cls.base_url = url.rstrip("/")
+
+if os.environ.get("TRACKER_BASE_URL"): set_base_url(os.environ["TRACKER_BASE_URL"])
 
 def get_tracker(courier):
     if courier == "Blue Dart": return BlueDartTracker()
@@ -228,9 +1060,959 @@ def get_tracker(courier):
     if courier == "Delhivery": return DelhiveryTracker()
     return None
 
-def load_tracking_list():
+# --- COURIER DETECTION ---
+
+# (courier, pattern, (min_len, max_len), score): AWB shapes each carrier
+# issues. Scores rank candidates when several carriers share a shape.
+DETECTION_RULES = [
+    ("Blue Dart", r"[5-9]\d{10}", (11, 11), 0.9),
+    ("Blue Dart", r"\d{11}", (11, 11), 0.7),
+    ("Blue Dart", r"\d{8,10}", (8, 10), 0.3),
+    ("DTDC", r"[A-Z]\d{8}", (9, 9), 0.95),
+    ("DTDC", r"[A-Z]{1,2}\d{9,10}", (10, 12), 0.8),
+    ("DTDC", r"\d{9}", (9, 9), 0.5),
+    ("DTDC", r"\d{10,12}", (10, 12), 0.2),
+    ("Delhivery", r"\d{14}", (14, 14), 0.95),
+    ("Delhivery", r"\d{13}", (13, 13), 0.85),
+    ("Delhivery", r"\d{12}", (12, 12), 0.5),
+    ("Delhivery", r"\d{10,11}", (10, 11), 0.2),
+]
+# Candidates within this margin of the best score count as ambiguous
+DETECTION_AMBIGUITY = 0.25
+
+@functools.lru_cache(maxsize=None)
+def _detection_index():
+    # Compiled rules bucketed by ID length, best score first, so detection only
+    # tries the few patterns that can fit. Built on first use.
+    index = {}
+    for courier, pattern, (low, high), score in DETECTION_RULES:
+        match = re.compile(pattern).fullmatch
+        for length in range(low, high + 1):
+            index.setdefault(length, []).append((match, courier, score))
+    for bucket in index.values(): bucket.sort(key=lambda rule: -rule[2])
+    return index
+
+def detect_couriers(tracking_number):
+    # Likely carriers for an ID, best first: [(courier, score), ...]
+    tid = tracking_number.strip().upper()
+    scores = {}
+    for match, courier, score in _detection_index().get(len(tid), ()):
+        if courier not in scores and match(tid): scores[courier] = score
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+def guess_courier(tracking_number, default="Blue Dart"):
+    candidates = detect_couriers(tracking_number)
+    return candidates[0][0] if candidates else default
+
+def ambiguous_candidates(tracking_number):
+    # Carriers close enough to the best guess that only a lookup can tell
+    candidates = detect_couriers(tracking_number)
+    if not candidates: return list(COURIERS)
+    best = candidates[0][1]
+    return [courier for courier, score in candidates if best - score <= DETECTION_AMBIGUITY]
+
+def probe_couriers(tracking_number, candidates=None, force=False):
+    # Look the ID up with every candidate carrier at once and keep the first
+    # valid answer. Returns (courier, data); if all fail, the best guess's error.
+    candidates = candidates or ambiguous_candidates(tracking_number)
+    if len(candidates) == 1:
+        return candidates[0], fetch_details(candidates[0], tracking_number, force)
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    results = {}
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        futures = {pool.submit(fetch_details, courier, tracking_number, force): courier for courier in candidates}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                courier = futures[future]
+                results[courier] = future.result()
+                if results[courier] and not results[courier].get("error") and has_tracking_data(results[courier]):
+                    return courier, results[courier]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return candidates[0], results[candidates[0]]
+
+def has_tracking_data(data):
+    # A carrier that doesn't know an ID may still answer 200 with an empty page
+    return bool(data.get("scans") or (data.get("status") and data.get("status") != "Unknown"))
+
+# --- RESPONSE CACHE ---
+
+# Response cache file of the JSON store; SQLite keeps it in a table
+CACHE_FILE = "tracking_cache.json"
+CACHE_MAX_ENTRIES = 5000
+# Seconds a fetched result stays fresh. Delivered shipments no longer change,
+# so they never expire; anything still moving is refetched sooner.
+CACHE_TTL_DELIVERED = None
+CACHE_TTL_OUT_FOR_DELIVERY = 120
+CACHE_TTL_IN_TRANSIT = 600
+
+def cache_ttl(status):
+    status = (status or "").lower()
+    if "out for delivery" in status: return CACHE_TTL_OUT_FOR_DELIVERY
+    if "delivered" in status and "undelivered" not in status and "not delivered" not in status:
+        return CACHE_TTL_DELIVERED
+    return CACHE_TTL_IN_TRANSIT
+
+class ResponseCache:
+    # LRU of normalized get_details() results keyed by (courier, tracking number),
+    # kept in the store's response_cache table between runs. Error results are
+    # never cached. Lookups read single rows; save() writes back only the entries
+    # put or used since the last save, so runs never rewrite the whole cache and
+    # concurrent processes merge rather than overwrite each other's entries.
+    def __init__(self, store=None, max_entries=CACHE_MAX_ENTRIES):
+        self._store = store
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # recently used rows, at most max_entries
+        self._puts = {}                 # key -> entry not yet saved
+        self._used = {}                 # key -> last use not yet saved
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        return self._store or get_store()
+
+    def get_entry(self, courier, tracking_number):
+        # {"fetched_at", "expires_at", "data"} or None if absent or expired
+        return self.get_entries(courier, [tracking_number]).get(tracking_number)
+
+    def get_entries(self, courier, tracking_numbers):
+        # {tid: entry} for the cached, unexpired IDs among tracking_numbers
+        keys = {f"{courier}|{tid}": tid for tid in tracking_numbers}
+        with self._lock:
+            found = {key: self._entries[key] for key in keys if key in self._entries}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            loaded = {key: dict(row, data=Shipment.from_dict(row["data"]))
+                      for key, row in self.store.cache_get_many(missing).items()}
+            found.update(loaded)
+        now = time.time()
+        results = {}
+        with self._lock:
+            for key, entry in found.items():
+                if entry["expires_at"] is not None and entry["expires_at"] <= now:
+                    self._entries.pop(key, None)
+                    continue
+                self._remember(key, entry)
+                self._used[key] = now
+                results[keys[key]] = entry
+        return results
+
+    def get(self, courier, tracking_number):
+        entry = self.get_entry(courier, tracking_number)
+        return None if entry is None else entry["data"]
+
+    def put(self, courier, tracking_number, data, fetched_at=None):
+        if not data or data.get("error"): return
+        ttl = cache_ttl(data.get("status"))
+        now = time.time()
+        key = f"{courier}|{tracking_number}"
+        entry = {"fetched_at": fetched_at or now, "expires_at": None if ttl is None else now + ttl, "data": data}
+        with self._lock:
+            self._remember(key, entry)
+            self._puts[key] = entry
+            self._used[key] = now
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            if not self._puts and not self._used: return
+            puts, used = self._puts, self._used
+            self._puts, self._used = {}, {}
+        try:
+            self.store.cache_write(puts, used, self.max_entries)
+        except (OSError, sqlite3.Error): pass
+
+CACHE = ResponseCache()
+
+class Flight:
+    # One in-progress lookup; followers block on `done` and share its outcome
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    # Coalesces concurrent lookups of the same (courier, tracking number): the
+    # first caller (the leader) fetches, later callers wait for its result
+    # instead of sending their own request. Nothing is kept once a flight lands;
+    # reuse across time is the response cache's job.
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def begin(self, key):
+        # Returns (flight, leader). A leader must call finish() exactly once.
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                METRICS.inc("tracker_coalesced_total", courier=key[0])
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.leaders += 1
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight: del self._flights[key]
+        flight.result, flight.error = result, error
+        flight.done.set()
+
+    def wait(self, flight):
+        flight.done.wait()
+        if flight.error is not None: raise flight.error
+        return flight.result
+
+    def do(self, key, fn, *args):
+        flight, leader = self.begin(key)
+        if not leader: return self.wait(flight)
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result
+
+INFLIGHT = SingleFlight()
+
+def fetch_details(courier, tracking_number, force=False):
+    # get_details() behind the response cache; force skips the cache lookup
+    # but still stores the fresh result.
+    tracker = get_tracker(courier)
+    if not tracker: return None
+    if not force:
+        cached = CACHE.get(courier, tracking_number)
+        if cached is not None: return cached
+    return INFLIGHT.do((courier, tracking_number), _fetch_and_cache, tracker, tracking_number)
+
+def _fetch_and_cache(tracker, tracking_number):
+    data = tracker.get_details(tracking_number)
+    CACHE.put(tracker.courier, tracking_number, data, archived_at(tracking_number))
+    # Single lookups are never recorded, so nothing will claim the archive time
+    forget_unrecorded([tracking_number])
+    return data
+
+def archived_at(tracking_number):
+    # fetched_at of the body just archived for tracking_number, if --keep-raw
+    # is on; the cache entry shares it so a later hit can report it
+    return RAW_ARCHIVE.unrecorded.get(tracking_number) if RAW_ARCHIVE is not None else None
+
+def note_cache_hits(entries):
+    # A result answered from the cache was fetched at the entry's fetched_at,
+    # not now: hand that to record_refresh as checked_at, so --reparse still
+    # treats the archived body it came from as current
+    if RAW_ARCHIVE is None: return
+    for tid, entry in entries.items(): RAW_ARCHIVE.unrecorded[tid] = entry["fetched_at"]
+
+def forget_unrecorded(tracking_numbers):
+    # Drop archive times no record_refresh will take, so RawArchive.unrecorded
+    # only holds results on their way to the store
+    if RAW_ARCHIVE is None: return
+    for tid in tracking_numbers: RAW_ARCHIVE.unrecorded.pop(tid, None)
+
+def fetch_details_many(courier, tracking_numbers, force=False):
+    # Batched fetch_details(): cached IDs are answered locally, the rest go
+    # upstream in as few requests as the carrier allows
+    tracker = get_tracker(courier)
+    if not tracker: return {}
+    cached = {} if force else CACHE.get_entries(courier, tracking_numbers)
+    note_cache_hits(cached)
+    results = {tid: entry["data"] for tid, entry in cached.items()}
+    missing = [tid for tid in tracking_numbers if tid not in results]
+    # Join lookups already in flight elsewhere; batch-fetch only the rest
+    flights, owned, joined = {}, [], []
+    for tid in dict.fromkeys(missing):
+        flights[tid], leader = INFLIGHT.begin((courier, tid))
+        (owned if leader else joined).append(tid)
+    fetched = {}
+    try:
+        if owned: fetched = tracker.get_details_many(owned)
+    except BaseException as e:
+        for tid in owned: INFLIGHT.finish((courier, tid), flights[tid], error=e)
+        raise
+    for tid in owned:
+        data = fetched.get(tid)
+        CACHE.put(courier, tid, data, archived_at(tid))
+        INFLIGHT.finish((courier, tid), flights[tid], data)
+        results[tid] = data
+    for tid in joined: results[tid] = INFLIGHT.wait(flights[tid])
+    # Failed lookups (parse errors included) are never recorded
+    forget_unrecorded([tid for tid, data in results.items() if not data or data.get("error")])
+    return results
+
+# --- REFRESH ENGINE ---
+
+# Max in-flight requests per carrier. Each carrier gets its own pool so a slow
+# or throttled host never starves the others of workers.
+COURIER_CONCURRENCY = {"Blue Dart": 4, "DTDC": 4, "Delhivery": 8}
+
+def iter_refresh(items, workers=None, force=False, window=None):
+    # Yields (tid, data) as fetches finish. items may be a lazy iterator of
+    # (tracking_number, courier); at most `window` IDs are buffered or in flight
+    # at once, so memory stays flat however long the list is. IDs are grouped
+    # per carrier into batches of up to its max_batch. Unknown couriers are skipped.
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    if window is None: window = 1000
+    items = iter(items)
+    trackers, pools, futures, buffers = {}, {}, {}, {}
+    queued = 0
+    exhausted = False
+
+    def submit(courier):
+        if courier not in pools:
+            size = COURIER_CONCURRENCY.get(courier, 1)
+            if workers: size = min(size, workers)
+            pools[courier] = ThreadPoolExecutor(max_workers=size)
+        chunk = buffers.pop(courier)
+        futures[pools[courier].submit(fetch_details_many, courier, chunk, force)] = chunk
+
+    try:
+        while True:
+            while not exhausted and queued < window:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                tid, courier = item
+                if courier not in trackers: trackers[courier] = get_tracker(courier)
+                if not trackers[courier]: continue
+                buffers.setdefault(courier, []).append(tid)
+                queued += 1
+                if len(buffers[courier]) >= trackers[courier].max_batch: submit(courier)
+            # Send partial batches once nothing more can be buffered
+            if exhausted or queued >= window or not futures:
+                for courier in list(buffers): submit(courier)
+            if not futures: return
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = futures.pop(future)
+                results = future.result()
+                for tid in chunk:
+                    queued -= 1
+                    yield tid, results[tid]
+    finally:
+        for pool in pools.values(): pool.shutdown(wait=True, cancel_futures=True)
+
+def refresh_many(items, workers=None, on_result=None, force=False):
+    # items: iterable of (tracking_number, courier). Returns {tid: data} in input
+    # order; entries with an unknown courier are left out, like the serial loop.
+    # on_result(tid, data, done, total) runs on the calling thread as fetches land.
+    # force bypasses the response cache.
+    items = [(tid, courier) for tid, courier in items if get_tracker(courier)]
+    results = {}
+    for done, (tid, data) in enumerate(iter_refresh(items, workers, force, window=max(1, len(items))), 1):
+        results[tid] = data
+        if on_result: on_result(tid, data, done, len(items))
+    return {tid: results[tid] for tid, _ in items if tid in results}
+
+def parse_shard(text):
+    # "i/N" (1-based, as on the command line) -> (i - 1, N)
+    index, _, count = text.partition("/")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count: raise ValueError(f"shard {text} is not in 1/N..N/N")
+    return index - 1, count
+
+def in_shard(tid, shard):
+    # Stable across processes and hosts (unlike hash()), so N runs with
+    # shards 1/N..N/N cover every shipment exactly once
+    return shard is None or zlib.crc32(tid.encode("utf-8")) % shard[1] == shard[0]
+
+def stream_refresh(out, workers=None, force=False, no_cache=False, batch_size=200, shard=None):
+    # NDJSON batch refresh: reads the store lazily, writes one line per shipment
+    # to `out` as soon as its fetch finishes and persists results in batches.
+    store = get_store()
+    refresh_id = store.begin_refresh()
+    inflight = {}
+    done = {}
+
+    def emit(record):
+        out.write(json.dumps(record, default=json_default) + "\n")
+        out.flush()
+
+    def flush():
+        record_refresh({tid: info for tid, (info, _) in done.items()},
+                       {tid: data for tid, (_, data) in done.items()}, refresh_id)
+        done.clear()
+
+    def todo():
+        for tid, info in store.iter_records():
+            if not in_shard(tid, shard): continue
+            # Skip if delivered and not forced
+            if info.get("status") == "Delivered" and not force:
+                emit(dict(info, tracking_number=tid))
+                continue
+            inflight[tid] = info
+            yield tid, info.get("courier", "Blue Dart")
+
+    for tid, data in iter_refresh(todo(), workers, force or no_cache):
+        info = inflight.pop(tid)
+        if data.get("error"):
+            emit({"tracking_number": tid, "error": data.get("error"), "courier": info.get("courier", "Blue Dart")})
+            continue
+        emit(data)
+        done[tid] = (info, data)
+        if len(done) >= batch_size: flush()
+    if done: flush()
+    archive_delivered()
+
+def apply_result(saved_list, tid, data, checked_at=None):
+    # Fold a successful fetch into the saved entry; checked_at is when it was
+    # fetched, if not just now
+    status = data.get("status") or "Unknown"
+    summary = {
+        "status": status,
+        "recipient": data.get("delivery_details", {}).get("Recipient", "N/A")
+    }
+    entry = saved_list[tid]
+    entry.update({
+        "status": "Delivered" if "Delivered" in status else "Pending",
+        "last_checked": "Now",
+        "checked_at": checked_at or time.time(),
+        "summary": summary
+    })
+    # When it was delivered (the last scan, if dated) drives archiving
+    if entry["status"] != "Delivered": entry.pop("delivered_at", None)
+    elif not entry.get("delivered_at"): entry["delivered_at"] = getattr(data, "last_scan_at", None) or entry["checked_at"]
+
+def newest_scan_at(data):
+    # When the latest dated scan happened, None if no scan has a usable date
+    if isinstance(data, Shipment): return data.last_scan_at
+    return max((at for at in (scan_epoch(s.get("date"), s.get("time")) for s in data.get("scans") or []) if at is not None),
+               default=None)
+
+def record_refresh(saved_list, fetched, refresh_id=None, checked_at=None):
+    # Apply successful fetches to saved_list, persist them and merge their scans
+    # into the history. Returns what changed in this refresh:
+    # {tid: {"courier", "status", "previous_status", "new_scans"}}
+    store = get_store()
+    if refresh_id is None: refresh_id = store.begin_refresh()
+    updated = {tid: data for tid, data in fetched.items() if not data.get("error") and tid in saved_list}
+    previous = {tid: (saved_list[tid].get("summary") or {}).get("status") for tid in updated}
+    if checked_at is None and RAW_ARCHIVE is not None:
+        # Claimed for every fetched ID, including those not applied here
+        checked_at = {tid: RAW_ARCHIVE.unrecorded.pop(tid) for tid in fetched if tid in RAW_ARCHIVE.unrecorded}
+    for tid, data in updated.items(): apply_result(saved_list, tid, data, (checked_at or {}).get(tid))
+    new_scans = store.merge_scans_many(((tid, data.get("scans") or []) for tid, data in updated.items()), refresh_id)
+    # Movement is when the carrier scanned it, not when we noticed: a shipment
+    # first added (or re-fetched) days after its last scan is already stalled.
+    # Wall-clock time is only the fallback for scans without a parseable date.
+    for tid in new_scans:
+        entry = saved_list[tid]
+        moved = newest_scan_at(updated[tid])
+        entry["last_movement"] = min(moved, entry["checked_at"]) if moved is not None else entry["checked_at"]
+    # Only the refresh's own fields are written, and only to shipments still in
+    # the store: another process may have edited or deleted them meanwhile
+    store.update_many((tid, {k: saved_list[tid].get(k) for k in REFRESH_FIELDS}) for tid in updated)
+
+    changes = {}
+    for tid in updated:
+        status = saved_list[tid]["summary"]["status"]
+        if tid in new_scans or status != previous[tid]:
+            changes[tid] = {
+                "courier": saved_list[tid].get("courier", "Blue Dart"),
+                "status": status,
+                "previous_status": previous[tid],
+                "new_scans": new_scans.get(tid, [])
+            }
+    return changes
+
+# --- STORAGE ---
+
+TRACKING_DB = "tracking_list_v2.db"
+HISTORY_FILE = "tracking_history.json"
+# "sqlite" (default) or "json" for the legacy whole-file tracking_list_v2.json
+STORE_BACKEND = os.environ.get("TRACKER_STORE", "sqlite")
+
+# Entry fields a refresh owns; everything else in an entry is left as stored
+REFRESH_FIELDS = ("status", "last_checked", "checked_at", "summary", "last_movement", "delivered_at")
+
+class FileLock:
+    # Exclusive advisory lock (flock) on `path`, shared by every process using
+    # the same directory. Re-entrant within a process; flock alone isn't, since
+    # two opens of one file in one process would block each other.
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if not self._depth:
+            self._file = open(self.path, "a")
+            if fcntl: fcntl.flock(self._file, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if not self._depth:
+            if fcntl: fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+def write_json_atomic(path, data, indent=None):
+    # Write to a temp file and rename over the target, so a crash mid-write
+    # leaves the previous version intact. The temp name is unique per process
+    # and thread, so concurrent writers (e.g. --shard runs saving the cache)
+    # never rename each other's half-written file; the last rename wins.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=indent, default=json_default)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+def scan_fingerprint(scan):
+    # Stable identity of a scan event across refreshes
+    import hashlib
+    raw = "\x1f".join(str(scan.get(k) or "") for k in ("date", "time", "location", "details"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+def new_scan_events(known, scans):
+    # Scans whose fingerprint is not in `known` (a set, updated in place), in
+    # the order the carrier returned them
+    fresh = []
+    for scan in scans:
+        fp = scan_fingerprint(scan)
+        if fp in known: continue
+        known.add(fp)
+        fresh.append({"fingerprint": fp, "location": scan.get("location"), "details": scan.get("details"),
+                      "date": scan.get("date"), "time": scan.get("time")})
+    return fresh
+
+class JsonStore:
+    # The original tracking_list_v2.json format. Every write rewrites the file,
+    # but through a temp file + rename so an interrupted write can't truncate it.
+    # Scan history lives in a HISTORY_FILE sidecar, the response cache in
+    # CACHE_FILE.
+    # Read-modify-write operations hold a lock file, so concurrent processes
+    # merge their changes instead of the last full write winning.
+    def __init__(self, path=TRACKING_FILE, history_path=HISTORY_FILE, cache_path=CACHE_FILE):
+        self.path = path
+        self.history_path = history_path
+        self.cache_path = cache_path
+        self.is_new = not os.path.exists(path)
+        self.lock = FileLock(path + ".lock")
+        self._cache = None
+
+    @timed("store_operation_seconds", op="load")
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    @timed("store_operation_seconds", op="save")
+    def save(self, data):
+        with self.lock:
+            write_json_atomic(self.path, data, indent=2)
+        self.is_new = False
+
+    @timed("store_operation_seconds", op="upsert_many")
+    def upsert_many(self, records):
+        with self.lock:
+            data = self.load()
+            data.update(records)
+            self.save(data)
+
+    @timed("store_operation_seconds", op="update_many")
+    def update_many(self, records):
+        # Merge fields into entries that still exist; None removes a field
+        with self.lock:
+            data = self.load()
+            changed = False
+            for tid, fields in records:
+                if tid not in data: continue
+                data[tid] = merge_fields(data[tid], fields)
+                changed = True
+            if changed: self.save(data)
+
+    @timed("store_operation_seconds", op="insert_new_many")
+    def insert_new_many(self, records):
+        # Add records whose ID isn't tracked yet; returns how many were added
+        with self.lock:
+            data = self.load()
+            added = 0
+            for tid, info in records:
+                if tid in data: continue
+                data[tid] = info
+                added += 1
+            if added: self.save(data)
+        return added
+
+    def iter_records(self):
+        yield from self.load().items()
+
+    def get(self, tid):
+        return self.load().get(tid)
+
+    def select(self, courier=None, status=None):
+        return {tid: info for tid, info in self.load().items()
+                if (courier is None or info.get("courier") == courier) and (status is None or info.get("status") == status)}
+
+    def upsert(self, tid, info):
+        self.upsert_many([(tid, info)])
+
+    def delete(self, tid):
+        return self.delete_many([tid]) > 0
+
+    def delete_many(self, tids):
+        # Returns how many of tids were tracked
+        tids = set(tids)
+        with self.lock:
+            data = self.load()
+            deleted = len(tids & data.keys())
+            if deleted: self.save({tid: info for tid, info in data.items() if tid not in tids})
+            history = self._load_history()
+            if tids & history["scans"].keys():
+                history["scans"] = {tid: scans for tid, scans in history["scans"].items() if tid not in tids}
+                write_json_atomic(self.history_path, history)
+        return deleted
+
+    def _load_history(self):
+        try:
+            with open(self.history_path, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return {"last_refresh": 0, "scans": {}}
+
+    def begin_refresh(self):
+        with self.lock:
+            history = self._load_history()
+            history["last_refresh"] += 1
+            write_json_atomic(self.history_path, history)
+        return history["last_refresh"]
+
+    def scans(self, tid):
+        return self._load_history()["scans"].get(tid, [])
+
+    def iter_scans(self):
+        # (tid, location, date, time) for every stored scan
+        for tid, events in self._load_history()["scans"].items():
+            for e in events: yield tid, e.get("location") or "N/A", e.get("date"), e.get("time")
+
+    def version(self):
+        # Changes whenever the list file is rewritten
+        try: return os.stat(self.path).st_mtime_ns
+        except OSError: return None
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def cache_get_many(self, keys):
+        # {key: {"fetched_at", "expires_at", "data"}} for the keys cached. The
+        # file is read once per process; cache_write keeps the copy current.
+        if self._cache is None: self._cache = self._load_cache()
+        return {key: self._cache[key] for key in keys if key in self._cache}
+
+    @timed("store_operation_seconds", op="cache_write")
+    def cache_write(self, puts, used, max_entries):
+        # Merge new entries and last-used times into the cache on disk, drop
+        # expired entries, and keep the max_entries most recently used
+        now = time.time()
+        with self.lock:
+            cache = self._load_cache()
+            for key, entry in puts.items():
+                cache[key] = {"fetched_at": entry["fetched_at"], "expires_at": entry["expires_at"],
+                              "used_at": used.get(key, now), "data": entry["data"]}
+            for key, used_at in used.items():
+                if key in cache: cache[key]["used_at"] = used_at
+            live = [(key, entry) for key, entry in cache.items() if entry["expires_at"] is None or entry["expires_at"] > now]
+            live.sort(key=lambda item: item[1].get("used_at", 0), reverse=True)
+            cache = dict(live[:max_entries])
+            write_json_atomic(self.cache_path, cache)
+        self._cache = json.loads(json.dumps(cache, default=json_default))
+
+    @timed("store_operation_seconds", op="merge_scans_many")
+    def merge_scans_many(self, items, refresh_id):
+        # items: iterable of (tid, scans). Returns {tid: [new events]}
+        with self.lock:
+            history = self._load_history()
+            now = time.time()
+            changes = {}
+            for tid, scans in items:
+                stored = history["scans"].setdefault(tid, [])
+                fresh = new_scan_events({e["fingerprint"] for e in stored}, scans)
+                for event in fresh:
+                    stored.append(dict(event, first_seen=now, refresh_id=refresh_id))
+                if fresh: changes[tid] = fresh
+            if changes: write_json_atomic(self.history_path, history)
+        return changes
+
+class SqliteStore:
+    # One row per shipment; the entry dict is kept as JSON in `data`, with
+    # courier and status pulled out into indexed columns. Rowid order keeps
+    # load() in insertion order like the JSON file.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS shipments (
+            tracking_number TEXT PRIMARY KEY,
+            courier TEXT NOT NULL,
+            status TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_shipments_courier ON shipments(courier);
+        CREATE INDEX IF NOT EXISTS idx_shipments_status ON shipments(status);
+        CREATE TABLE IF NOT EXISTS scans (
+            tracking_number TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            location TEXT,
+            details TEXT,
+            date TEXT,
+            time TEXT,
+            first_seen REAL NOT NULL,
+            refresh_id INTEGER NOT NULL,
+            PRIMARY KEY (tracking_number, fingerprint)
+        );
+        CREATE TABLE IF NOT EXISTS refreshes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS response_cache (
+            key TEXT PRIMARY KEY,
+            fetched_at REAL NOT NULL,
+            expires_at REAL,
+            used_at REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_response_cache_used ON response_cache(used_at);
+    """
+    UPSERT = """
+        INSERT INTO shipments (tracking_number, courier, status, data) VALUES (?, ?, ?, ?)
+        ON CONFLICT(tracking_number) DO UPDATE SET
+            courier = excluded.courier, status = excluded.status, data = excluded.data
+    """
+
+    def __init__(self, path=TRACKING_DB):
+        self.path = path
+        self.is_new = not os.path.exists(path)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(tid, info):
+        return (tid, info.get("courier") or "Blue Dart", info.get("status"), json.dumps(info))
+
+    @timed("store_operation_seconds", op="load")
+    def load(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT tracking_number, data FROM shipments ORDER BY rowid").fetchall()
+        return {tid: json.loads(data) for tid, data in rows}
+
+    def iter_records(self, page_size=1000):
+        # (tid, info) pairs a page at a time, without loading the whole table
+        last = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, tracking_number, data FROM shipments WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, page_size)).fetchall()
+            if not rows: return
+            for _, tid, data in rows: yield tid, json.loads(data)
+            last = rows[-1][0]
+
+    def get(self, tid):
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM shipments WHERE tracking_number = ?", (tid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def select(self, courier=None, status=None):
+        query, params = "SELECT tracking_number, data FROM shipments WHERE 1=1", []
+        if courier is not None: query += " AND courier = ?"; params.append(courier)
+        if status is not None: query += " AND status = ?"; params.append(status)
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY rowid", params).fetchall()
+        return {tid: json.loads(data) for tid, data in rows}
+
+    @timed("store_operation_seconds", op="save")
+    def save(self, data):
+        # Replace the whole list: upsert everything, drop rows no longer present
+        with self.transaction() as conn:
+            existing = {tid for (tid,) in conn.execute("SELECT tracking_number FROM shipments")}
+            conn.executemany("DELETE FROM shipments WHERE tracking_number = ?",
+                             ((tid,) for tid in existing - data.keys()))
+            conn.executemany(self.UPSERT, (self._row(tid, info) for tid, info in data.items()))
+        self.is_new = False
+
+    @timed("store_operation_seconds", op="upsert_many")
+    def upsert_many(self, records):
+        with self.transaction() as conn:
+            conn.executemany(self.UPSERT, (self._row(tid, info) for tid, info in records))
+        self.is_new = False
+
+    @timed("store_operation_seconds", op="update_many")
+    def update_many(self, records):
+        # Merge fields into rows that still exist, reading each row inside the
+        # write transaction so a concurrent writer's other fields survive
+        with self.transaction() as conn:
+            for tid, fields in records:
+                row = conn.execute("SELECT data FROM shipments WHERE tracking_number = ?", (tid,)).fetchone()
+                if row is None: continue
+                info = merge_fields(json.loads(row[0]), fields)
+                conn.execute("UPDATE shipments SET status = ?, data = ? WHERE tracking_number = ?",
+                             (info.get("status"), json.dumps(info), tid))
+
+    @timed("store_operation_seconds", op="insert_new_many")
+    def insert_new_many(self, records):
+        # Add records whose ID isn't tracked yet, in one transaction; returns
+        # how many were added
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO shipments (tracking_number, courier, status, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(tracking_number) DO NOTHING",
+                (self._row(tid, info) for tid, info in records))
+            added = conn.total_changes - before
+        self.is_new = False
+        return added
+
+    def upsert(self, tid, info):
+        self.upsert_many([(tid, info)])
+
+    def delete(self, tid):
+        return self.delete_many([tid]) > 0
+
+    def delete_many(self, tids):
+        # Returns how many of tids were tracked
+        deleted = 0
+        with self.transaction() as conn:
+            for tid in tids:
+                deleted += conn.execute("DELETE FROM shipments WHERE tracking_number = ?", (tid,)).rowcount
+                conn.execute("DELETE FROM scans WHERE tracking_number = ?", (tid,))
+        return deleted
+
+    def begin_refresh(self):
+        with self.transaction() as conn:
+            return conn.execute("INSERT INTO refreshes (started_at) VALUES (?)", (time.time(),)).lastrowid
+
+    def scans(self, tid):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT fingerprint, location, details, date, time, first_seen, refresh_id FROM scans "
+                "WHERE tracking_number = ? ORDER BY rowid", (tid,)).fetchall()
+        keys = ("fingerprint", "location", "details", "date", "time", "first_seen", "refresh_id")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def iter_scans(self):
+        # (tid, location, date, time) for every stored scan
+        with self._lock:
+            yield from self.conn.execute("SELECT tracking_number, COALESCE(location, 'N/A'), date, time FROM scans").fetchall()
+
+    @timed("store_operation_seconds", op="merge_scans_many")
+    def merge_scans_many(self, items, refresh_id):
+        # items: iterable of (tid, scans). Returns {tid: [new events]}
+        now = time.time()
+        changes = {}
+        with self.transaction() as conn:
+            for tid, scans in items:
+                known = {fp for (fp,) in conn.execute("SELECT fingerprint FROM scans WHERE tracking_number = ?", (tid,))}
+                fresh = new_scan_events(known, scans)
+                conn.executemany(
+                    "INSERT INTO scans (tracking_number, fingerprint, location, details, date, time, first_seen, refresh_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((tid, e["fingerprint"], e["location"], e["details"], e["date"], e["time"], now, refresh_id) for e in fresh))
+                if fresh: changes[tid] = fresh
+        return changes
+
+    def version(self):
+        # Changes whenever another connection (process) commits to the database
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def cache_get_many(self, keys, chunk=500):
+        # {key: {"fetched_at", "expires_at", "data"}} for the keys cached
+        found = {}
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT key, fetched_at, expires_at, data FROM response_cache WHERE key IN ({','.join('?' * len(part))})",
+                    part).fetchall()
+            for key, fetched_at, expires_at, data in rows:
+                found[key] = {"fetched_at": fetched_at, "expires_at": expires_at, "data": json.loads(data)}
+        return found
+
+    @timed("store_operation_seconds", op="cache_write")
+    def cache_write(self, puts, used, max_entries):
+        # Upsert new entries and bump last-used times, then drop expired rows
+        # and all but the max_entries most recently used
+        now = time.time()
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO response_cache (key, fetched_at, expires_at, used_at, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET fetched_at = excluded.fetched_at, expires_at = excluded.expires_at, "
+                "used_at = excluded.used_at, data = excluded.data",
+                ((key, e["fetched_at"], e["expires_at"], used.get(key, now), json.dumps(e["data"], default=json_default))
+                 for key, e in puts.items()))
+            conn.executemany("UPDATE response_cache SET used_at = MAX(used_at, ?) WHERE key = ?",
+                             ((used_at, key) for key, used_at in used.items() if key not in puts))
+            conn.execute("DELETE FROM response_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            (count,) = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()
+            if count > max_entries:
+                conn.execute("DELETE FROM response_cache WHERE key IN "
+                             "(SELECT key FROM response_cache ORDER BY used_at LIMIT ?)", (count - max_entries,))
+
+STORES = {"json": JsonStore, "sqlite": SqliteStore}
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = STORES[STORE_BACKEND]()
+        if _store.is_new: migrate_legacy_files(_store)
+    return _store
+
+def migrate_legacy_files(store):
+    # Run by get_store() only when the store is first created, so opening an
+    # existing store costs no extra file checks
+    # Migration logic: v2 JSON -> SQLite, once
+    if isinstance(store, SqliteStore) and os.path.exists(TRACKING_FILE):
+        try:
+            store.save(JsonStore().load())
+            print("Migrated v2 tracking data to SQLite store.", file=sys.stderr)
+        except Exception: pass
     # Migration logic: Check if old file exists
-    if os.path.exists("tracking_list.json") and not os.path.exists(TRACKING_FILE):
+    if os.path.exists("tracking_list.json") and store.is_new:
         try:
             with open("tracking_list.json", 'r') as f:
                 old_data = json.load(f)
@@ -242,29 +2024,999 @@ def load_tracking_list():
                     "last_checked": info.get("last_checked"),
                     "summary": info.get("summary")
                 }
-            save_tracking_list(new_data)
+            store.save(new_data)
             print("Migrated old tracking data to v2 format.")
         except: pass
 
-    if not os.path.exists(TRACKING_FILE):
-        return {}
-    try:
-        with open(TRACKING_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+def load_tracking_list():
+    return get_store().load()
 
 def save_tracking_list(data):
-    with open(TRACKING_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    get_store().save(data)
+
+def merge_fields(info, fields):
+    merged = dict(info)
+    for key, value in fields.items():
+        if value is None: merged.pop(key, None)
+        else: merged[key] = value
+    return merged
+
+# --- ARCHIVE ---
+
+ARCHIVE_FILE = "tracking_archive.jsonl.gz"
+ARCHIVE_INDEX = "tracking_archive.idx"
+# Days after delivery before a shipment leaves the active list; negative disables
+ARCHIVE_AFTER_DAYS = float(os.environ.get("TRACKER_ARCHIVE_DAYS", "14"))
+ARCHIVE_LOCK = FileLock(ARCHIVE_FILE + ".lock")
+
+def archive_delivered(saved_list=None, after_days=None, now=None):
+    # Move shipments delivered more than after_days ago, with their scan
+    # history, from the store into the archive. saved_list, if given, is kept
+    # in step. Returns the archived IDs. A Delivered entry with no timestamp
+    # (written before delivered_at existed) is stamped now instead, so it
+    # stays for the full after_days rather than being archived at once.
+    after_days = ARCHIVE_AFTER_DAYS if after_days is None else after_days
+    if after_days < 0: return []
+    now = now or time.time()
+    cutoff = now - after_days * 86400
+    store = get_store()
+    # Concurrent runs take turns, so a shipment is archived once
+    with ARCHIVE_LOCK:
+        delivered = store.select(status="Delivered")
+        unstamped = {tid for tid, info in delivered.items() if not (info.get("delivered_at") or info.get("checked_at"))}
+        if unstamped:
+            store.update_many((tid, {"delivered_at": now}) for tid in unstamped)
+            if saved_list is not None:
+                for tid in unstamped:
+                    if tid in saved_list: saved_list[tid]["delivered_at"] = now
+        due = {tid: info for tid, info in delivered.items()
+               if tid not in unstamped and (info.get("delivered_at") or info["checked_at"]) <= cutoff}
+        if not due: return []
+        # Archive first, then delete: a crash in between leaves a duplicate, never a loss
+        append_archive([dict(info, tracking_number=tid, archived_at=now, history=store.scans(tid)) for tid, info in due.items()])
+        store.delete_many(due)
+    if saved_list is not None:
+        for tid in due: saved_list.pop(tid, None)
+    return list(due)
+
+def append_archive(records, path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX):
+    # Each call appends one gzip member (concatenated members are still one
+    # valid .gz stream). The index maps each ID to the offset of its member.
+    import gzip
+    with open(path, "ab") as raw:
+        offset = raw.tell()
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for record in records: gz.write(json.dumps(record, default=json_default).encode("utf-8") + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    with open(index_path, "a") as f:
+        f.writelines(f"{record['tracking_number']}\t{offset}\n" for record in records)
+
+def find_archived(tid, path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX):
+    # Latest archived record for tid, or None. With the index only one gzip
+    # member is decompressed; without it the whole archive is scanned.
+    if not os.path.exists(path): return None
+    import gzip
+    offset = None
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            for line in f:
+                key, _, value = line.rstrip("\n").partition("\t")
+                if key == tid: offset = int(value)
+        if offset is None: return None
+    needle = json.dumps(tid).encode("utf-8")
+    found = None
+    with open(path, "rb") as raw:
+        raw.seek(offset or 0)
+        with gzip.GzipFile(fileobj=raw) as gz:
+            for line in gz:
+                if needle not in line: continue
+                record = json.loads(line)
+                if record.get("tracking_number") != tid: continue
+                found = record
+                if offset is not None: break
+    return found
+
+def iter_archive(path=ARCHIVE_FILE):
+    # Every archived record, oldest first
+    if not os.path.exists(path): return
+    import gzip
+    with gzip.open(path, "rb") as gz:
+        for line in gz: yield json.loads(line)
+
+def find_shipment(tid):
+    # Active entry or archived record for tid, with its scan history
+    store = get_store()
+    info = store.get(tid)
+    if info is not None: return dict(info, tracking_number=tid, archived=False, history=store.scans(tid))
+    record = find_archived(tid)
+    return None if record is None else dict(record, archived=True)
+
+# --- RAW RESPONSE ARCHIVE ---
+
+RAW_ARCHIVE_DIR = "raw_responses"
+
+class RawArchive:
+    # Upstream bodies as fetched, for re-parsing offline. objects/ holds each
+    # distinct body once, gzipped and named by its sha256; manifest.jsonl logs
+    # every fetch as {"courier", "ids", "fetched_at", "sha256"}.
+    def __init__(self, root=RAW_ARCHIVE_DIR):
+        self.root = root
+        self.manifest = os.path.join(root, "manifest.jsonl")
+        self._lock = threading.Lock()
+        # tid -> fetched_at of its last put() (or of the cache entry a refresh
+        # was answered from) not yet recorded; record_refresh uses it as
+        # checked_at, so the store and manifest agree on which body the stored
+        # state came from
+        self.unrecorded = {}
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest + ".gz")
+
+    def put(self, courier, tracking_numbers, body):
+        import gzip, hashlib
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(gzip.compress(body, mtime=0))
+            os.replace(tmp, path)
+        fetched_at = time.time()
+        line = json.dumps({"courier": courier, "ids": list(tracking_numbers), "fetched_at": fetched_at, "sha256": digest})
+        for tid in tracking_numbers: self.unrecorded[tid] = fetched_at
+        # One short O_APPEND write per fetch, so concurrent processes don't interleave
+        with self._lock, open(self.manifest, "a") as f:
+            f.write(line + "\n")
+        return digest
+
+    def get(self, digest):
+        import gzip
+        with open(self.object_path(digest), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def entries(self):
+        try:
+            with open(self.manifest) as f:
+                for line in f:
+                    if line.strip(): yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def latest(self):
+        # {(courier, tid): newest manifest entry that covers it}
+        newest = {}
+        for entry in self.entries():
+            for tid in entry["ids"]:
+                key = (entry["courier"], tid)
+                if key not in newest or entry["fetched_at"] >= newest[key]["fetched_at"]: newest[key] = entry
+        return newest
+
+RAW_ARCHIVE = RawArchive() if os.environ.get("TRACKER_KEEP_RAW") else None
+
+def reparse_body(root, courier, digest, tracking_numbers):
+    # Worker-process side of --reparse: parse one archived body for the IDs it
+    # answered. Never raises; parse failures come back as error results. A
+    # single-ID carrier's body says the same for every ID that got it, so it
+    # is parsed once and the result copied for the others.
+    tracker = get_tracker(courier)
+    try:
+        body = RawArchive(root).get(digest)
+        if tracker.max_batch > 1: return tracker.parse_many(body, tracking_numbers)
+        data = tracker.parse(body, tracking_numbers[0])
+        if not isinstance(data, Shipment): return {tid: dict(data) for tid in tracking_numbers}
+        return {tid: Shipment(data.status, data.delivery_details, data.scans, data.courier, tid) for tid in tracking_numbers}
+    except Exception as e:
+        e = classify_error(e)
+        return {tid: {"error": str(e), "courier": courier, "error_class": e.kind} for tid in tracking_numbers}
+
+def reparse_archive(saved_list, workers=None, archive=None):
+    # Re-run the current parsers over the newest archived body of every tracked
+    # shipment in a process pool and record the results, with no network
+    # traffic. Returns (parsed, failed, changes). A body older than the stored
+    # state (checked since without keeping the response) is left alone; the
+    # body the state was parsed from has fetched_at == checked_at.
+    archive = archive or RawArchive()
+    latest = archive.latest()
+    jobs, fetched_at = {}, {}
+    for tid, info in saved_list.items():
+        entry = latest.get((info.get("courier", "Blue Dart"), tid))
+        if entry is None or entry["fetched_at"] < (info.get("checked_at") or 0): continue
+        jobs.setdefault((entry["courier"], entry["sha256"]), []).append(tid)
+        fetched_at[tid] = entry["fetched_at"]
+    parsed = {}
+    if jobs:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(reparse_body, archive.root, courier, digest, tids) for (courier, digest), tids in jobs.items()]
+            for future in as_completed(futures): parsed.update(future.result())
+    failed = {tid: data for tid, data in parsed.items() if data.get("error")}
+    changes = record_refresh(saved_list, parsed, checked_at=fetched_at)
+    return parsed, failed, changes
+
+# --- REPORTS ---
+
+class ScanTable:
+    # Scan events as parallel arrays (one column per field, one row per event)
+    # instead of a dict per scan. Tracking numbers, couriers and locations are
+    # interned to int codes and times parsed to epoch seconds, so aggregates
+    # run as passes over flat arrays. Per-shipment columns are indexed by code.
+    def __init__(self):
+        self.tracking_numbers = {}
+        self.couriers = {}
+        self.locations = {}
+        self.shipment = array("l")
+        self.location = array("l")
+        self.at = array("q")
+        self.courier_of = array("l")
+        self.delivered = bytearray()
+
+    def add_shipment(self, tid, courier, delivered):
+        code = self.tracking_numbers.setdefault(tid, len(self.tracking_numbers))
+        if code == len(self.courier_of):
+            self.courier_of.append(self.couriers.setdefault(courier, len(self.couriers)))
+            self.delivered.append(bool(delivered))
+        return code
+
+    def extend(self, tids, locations, dates, times):
+        # Bulk-append scan rows given as columns; rows for unknown shipments or
+        # with unparseable dates are dropped
+        codes = list(map(self.tracking_numbers.get, tids))
+        at = scan_epochs(dates, times)
+        for name in set(locations) - self.locations.keys(): self.locations[name] = len(self.locations)
+        locations = map(self.locations.__getitem__, locations)
+        if None in codes or None in at:
+            keep = list(map(all, zip(map(operator.is_not, codes, itertools.repeat(None)),
+                                     map(operator.is_not, at, itertools.repeat(None)))))
+            codes, locations, at = (itertools.compress(c, keep) for c in (codes, list(locations), at))
+        self.shipment.extend(codes)
+        self.location.extend(locations)
+        self.at.extend(at)
+
+    def sort(self):
+        # Order rows by shipment, then time
+        if not self.at: return
+        base = min(self.at)
+        span = max(self.at) - base + 1
+        keys = [s * span + a - base for s, a in zip(self.shipment, self.at)]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.shipment = array("l", map(self.shipment.__getitem__, order))
+        self.location = array("l", map(self.location.__getitem__, order))
+        self.at = array("q", map(self.at.__getitem__, order))
+
+    def run_starts(self, column):
+        # Row indices where `column` changes value (column is sorted or grouped)
+        n = len(column)
+        return [0] + list(itertools.compress(range(1, n), map(operator.ne, itertools.islice(column, 1, None), column))) if n else []
+
+def load_scan_table(courier=None):
+    # Active shipments' stored scans plus the archive's, sorted
+    table = ScanTable()
+    store = get_store()
+    for tid, info in store.iter_records():
+        if courier and info.get("courier") != courier: continue
+        table.add_shipment(tid, info.get("courier", "Blue Dart"), info.get("status") == "Delivered")
+    columns = tuple(zip(*store.iter_scans()))
+    if columns: table.extend(*columns)
+    for record in iter_archive():
+        tid = record["tracking_number"]
+        if tid in table.tracking_numbers or (courier and record.get("courier") != courier): continue
+        table.add_shipment(tid, record.get("courier", "Blue Dart"), True)
+        history = record.get("history") or []
+        table.extend([tid] * len(history), [e.get("location") or "N/A" for e in history],
+                     [e.get("date") for e in history], [e.get("time") for e in history])
+    table.sort()
+    return table
+
+def percentile(ordered, q):
+    # Linear interpolation on an already sorted list
+    if not ordered: return None
+    rank = (len(ordered) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def group_stats(keys, values):
+    # {key: (count, median, p95)} over parallel key/value sequences
+    order = sorted(range(len(keys)), key=lambda i: (keys[i], values[i]))
+    stats = {}
+    for key, rows in itertools.groupby(order, key=keys.__getitem__):
+        ordered = list(map(values.__getitem__, rows))
+        stats[key] = (len(ordered), percentile(ordered, 0.5), percentile(ordered, 0.95))
+    return stats
+
+def lane_transit_stats(table):
+    # Transit time of delivered shipments from first to last scan, per
+    # (courier, origin, destination) where origin/destination are the first
+    # and last scan locations
+    starts = table.run_starts(table.shipment)
+    ends = starts[1:] + [len(table.at)]
+    ships = list(map(table.shipment.__getitem__, starts))
+    done = list(map(table.delivered.__getitem__, ships))
+    starts, ends, ships = (list(itertools.compress(c, done)) for c in (starts, ends, ships))
+    lasts = list(map(operator.sub, ends, itertools.repeat(1)))
+    lanes = list(zip(map(table.courier_of.__getitem__, ships),
+                     map(table.location.__getitem__, starts), map(table.location.__getitem__, lasts)))
+    durations = list(map(operator.sub, map(table.at.__getitem__, lasts), map(table.at.__getitem__, starts)))
+    return group_stats(lanes, durations)
+
+def hub_dwell_stats(table):
+    # Time from a shipment's first scan at a location until its first scan
+    # somewhere else, per location. The final location has no dwell.
+    hub = [s * len(table.locations) + l for s, l in zip(table.shipment, table.location)]
+    starts = table.run_starts(hub)
+    nexts = starts[1:]
+    same = list(map(operator.eq, map(table.shipment.__getitem__, starts[:-1]), map(table.shipment.__getitem__, nexts)))
+    starts, nexts = list(itertools.compress(starts, same)), list(itertools.compress(nexts, same))
+    dwell = list(map(operator.sub, map(table.at.__getitem__, nexts), map(table.at.__getitem__, starts)))
+    return group_stats(list(map(table.location.__getitem__, starts)), dwell)
+
+def transit_report(courier=None):
+    table = load_scan_table(courier)
+    couriers = {code: name for name, code in table.couriers.items()}
+    locations = {code: name for name, code in table.locations.items()}
+    hours = lambda seconds: round(seconds / 3600, 1)
+    return {
+        "events": len(table.at),
+        "shipments": len(table.courier_of),
+        "lanes": [{"courier": couriers[c], "origin": locations[o], "destination": locations[d],
+                   "shipments": n, "median_hours": hours(median), "p95_hours": hours(p95)}
+                  for (c, o, d), (n, median, p95) in sorted(lane_transit_stats(table).items(), key=lambda kv: -kv[1][0])],
+        "hubs": [{"location": locations[l], "visits": n, "median_hours": hours(median), "p95_hours": hours(p95)}
+                 for l, (n, median, p95) in sorted(hub_dwell_stats(table).items(), key=lambda kv: -kv[1][0])],
+    }
+
+def print_report(report):
+    print(f"{report['shipments']} shipments, {report['events']} scan events")
+    print("\nTransit time by lane (delivered, first to last scan)")
+    print(f"{'Courier':<10} {'Origin':<20} {'Destination':<20} {'n':>6} {'median h':>9} {'p95 h':>8}")
+    for lane in report["lanes"]:
+        print(f"{lane['courier']:<10} {lane['origin'][:20]:<20} {lane['destination'][:20]:<20} "
+              f"{lane['shipments']:>6} {lane['median_hours']:>9} {lane['p95_hours']:>8}")
+    print("\nDwell time by hub (first scan there to first scan elsewhere)")
+    print(f"{'Location':<42} {'n':>6} {'median h':>9} {'p95 h':>8}")
+    for hub in report["hubs"]:
+        print(f"{hub['location'][:42]:<42} {hub['visits']:>6} {hub['median_hours']:>9} {hub['p95_hours']:>8}")
+
+# --- BULK IMPORT ---
+
+IMPORT_ID_COLUMNS = ("tracking_number", "tracking number", "tracking_id", "id", "awb", "waybill")
+
+def read_import_file(path):
+    # Yields (tracking_number, courier) from a CSV or NDJSON file one row at a
+    # time. CSV may have a header naming its columns, otherwise it is read as
+    # id,courier. A missing courier yields None; an NDJSON line that isn't a
+    # JSON object yields (None, None) so it is counted as invalid.
+    import csv
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        first = f.readline()
+        if first.lstrip().startswith("{"):
+            for line in itertools.chain([first], f):
+                if not line.strip(): continue
+                try: row = json.loads(line)
+                except ValueError: row = None
+                if not isinstance(row, dict):
+                    yield None, None
+                    continue
+                tid = next((row[k] for k in IMPORT_ID_COLUMNS if row.get(k)), None)
+                courier = row.get("courier")
+                yield (str(tid).strip() if tid else None), (courier if isinstance(courier, str) else None)
+            return
+
+        rows = csv.reader(itertools.chain([first], f))
+        header = next(rows, None)
+        if header is None: return
+        names = [h.strip().lower() for h in header]
+        if any(n in IMPORT_ID_COLUMNS for n in names):
+            id_col = next(i for i, n in enumerate(names) if n in IMPORT_ID_COLUMNS)
+            courier_col = names.index("courier") if "courier" in names else None
+        else:
+            id_col, courier_col = 0, 1
+            rows = itertools.chain([header], rows)
+        for row in rows:
+            if len(row) <= id_col or not row[id_col].strip(): continue
+            courier = row[courier_col].strip() if courier_col is not None and len(row) > courier_col else None
+            yield row[id_col].strip(), courier or None
+
+def import_shipments(path):
+    # Bulk add from a file in a single store transaction.
+    # Returns (added, already_tracked, invalid)
+    counts = {"rows": 0, "invalid": 0}
+    def records():
+        for tid, courier in read_import_file(path):
+            counts["rows"] += 1
+            if not tid:
+                counts["invalid"] += 1
+                continue
+            courier = courier or guess_courier(tid)
+            if courier not in COURIERS:
+                counts["invalid"] += 1
+                continue
+            yield tid, {"courier": courier, "status": "Pending"}
+    added = get_store().insert_new_many(records())
+    return added, counts["rows"] - counts["invalid"] - added, counts["invalid"]
+
+# --- COMMANDS ---
+# Shared by the CLI and the HTTP service. saved_list None means no list is
+# held in memory: add and delete then read and write only that one record.
+
+def add_shipment(saved_list, tid, courier=None, probe=False):
+    # Returns (courier, added); added is False if the ID was already tracked
+    known = get_store().get(tid) if saved_list is None else saved_list.get(tid)
+    if known is not None: return known.get("courier", "Blue Dart"), False
+    if not courier and probe:
+        courier, _ = probe_couriers(tid)
+        CACHE.save()
+    courier = courier or guess_courier(tid)
+    info = {"courier": courier, "status": "Pending"}
+    if saved_list is None: return courier, get_store().insert_new_many([(tid, info)]) > 0
+    saved_list[tid] = info
+    get_store().upsert(tid, info)
+    return courier, True
+
+def delete_shipment(saved_list, tid):
+    if saved_list is None: return get_store().delete(tid)
+    if tid not in saved_list: return False
+    del saved_list[tid]
+    get_store().delete(tid)
+    return True
+
+def track_one(tid, courier=None, probe=False, force=False):
+    # Live lookup of one ID, tracked or not. Returns None for an unknown courier.
+    if not courier and probe: return probe_couriers(tid, force=force)[1]
+    return fetch_details(courier or guess_courier(tid), tid, force)
+
+def refresh_tracked(saved_list, workers=None, force=False, no_cache=False, shard=None):
+    # Batch refresh of the tracked list; delivered shipments are skipped unless
+    # forced. Returns (results, changes): results holds the full fetched data
+    # (or the saved entry for skipped IDs), changes is record_refresh()'s report.
+    pending, skipped = refresh_plan(saved_list, force, shard)
+    fetched = refresh_many(pending, workers=workers, force=force or no_cache)
+    CACHE.save()
+    # Update saved list
+    changes = record_refresh(saved_list, fetched)
+    return refresh_results(saved_list, fetched, skipped), changes
+
+def refresh_plan(saved_list, force=False, shard=None):
+    # Shipments outside the shard are neither refreshed nor reported
+    mine = {tid: info for tid, info in saved_list.items() if in_shard(tid, shard)}
+    # Skip if delivered and not forced
+    skipped = {tid for tid, info in mine.items() if info.get("status") == "Delivered" and not force}
+    pending = [(tid, info.get("courier", "Blue Dart")) for tid, info in mine.items() if tid not in skipped]
+    return pending, skipped
+
+def refresh_results(saved_list, fetched, skipped):
+    results = {}
+    for tid, info in saved_list.items():
+        if tid in skipped:
+            results[tid] = info
+            continue
+        if tid not in fetched: continue
+
+        data = fetched[tid]
+        if not data.get("error"):
+            results[tid] = data # Return full data in JSON output
+        else:
+            results[tid] = {"error": data.get("error"), "courier": info.get("courier", "Blue Dart")}
+    return results
+
+# --- DAEMON ---
+
+# Seconds between polls, by where a shipment is in its journey. Delivered
+# shipments are never polled again.
+POLL_OUT_FOR_DELIVERY = 15 * 60
+POLL_IN_TRANSIT = 60 * 60
+POLL_STALLED = 6 * 60 * 60
+POLL_AFTER_ERROR = 30 * 60
+# No new scan for this long counts as stalled
+STALLED_AFTER = 3 * 24 * 60 * 60
+# How often the daemon re-reads the store to pick up added/removed shipments
+DAEMON_RESCAN = 60
+
+def next_poll_delay(info, now=None):
+    # None means the shipment needs no further polling
+    if info.get("status") == "Delivered": return None
+    now = now or time.time()
+    status = ((info.get("summary") or {}).get("status") or "").lower()
+    if "out for delivery" in status: return POLL_OUT_FOR_DELIVERY
+    moved = info.get("last_movement") or info.get("checked_at")
+    if moved and now - moved > STALLED_AFTER: return POLL_STALLED
+    return POLL_IN_TRANSIT
+
+def run_daemon(saved_list, workers=None, metrics_file=None, shard=None):
+    # Poll shipments as they come due, ordered by next-due time, and write each
+    # result back to the store as it arrives
+    import heapq
+    queue = []      # heap of (due, tid)
+    scheduled = {}  # tid -> due; heap entries that don't match are stale
+
+    def schedule(tid, due):
+        if due is None:
+            scheduled.pop(tid, None)
+            return
+        scheduled[tid] = due
+        heapq.heappush(queue, (due, tid))
+
+    def schedule_from_store(tid, info, now):
+        if not in_shard(tid, shard): return None
+        delay = next_poll_delay(info, now)
+        return None if delay is None else (info.get("checked_at") or 0) + delay
+
+    now = time.time()
+    for tid, info in saved_list.items(): schedule(tid, schedule_from_store(tid, info, now))
+    next_rescan = now + DAEMON_RESCAN
+    print(f"[{time.strftime('%H:%M:%S')}] daemon started, {len(scheduled)} of {len(saved_list)} shipments active")
+
+    try:
+        while True:
+            now = time.time()
+            if now >= next_rescan:
+                archive_delivered()
+                current = load_tracking_list()
+                for tid in saved_list.keys() - current.keys(): scheduled.pop(tid, None)
+                for tid in current.keys() - saved_list.keys(): schedule(tid, schedule_from_store(tid, current[tid], now))
+                saved_list = current
+                next_rescan = now + DAEMON_RESCAN
+
+            due = []
+            while queue and queue[0][0] <= now:
+                when, tid = heapq.heappop(queue)
+                if scheduled.get(tid) == when and tid in saved_list:
+                    del scheduled[tid]
+                    due.append((tid, saved_list[tid].get("courier", "Blue Dart")))
+
+            if due:
+                refresh_id = get_store().begin_refresh()
+                changed, errors = 0, 0
+                def on_result(tid, data, done, total):
+                    nonlocal changed, errors
+                    if data.get("error"):
+                        errors += 1
+                        retry = POLL_STALLED if data.get("error_class") == "permanent" else POLL_AFTER_ERROR
+                        schedule(tid, time.time() + retry)
+                        return
+                    changed += len(record_refresh(saved_list, {tid: data}, refresh_id))
+                    delay = next_poll_delay(saved_list[tid])
+                    schedule(tid, None if delay is None else time.time() + delay)
+                refresh_many(due, workers=workers, on_result=on_result, force=True)
+                CACHE.save()
+                if metrics_file: METRICS.write_prometheus(metrics_file)
+                print(f"[{time.strftime('%H:%M:%S')}] polled {len(due)}, {changed} changed, {errors} errors, "
+                      f"{len(scheduled)} active", flush=True)
+
+            wake = min(queue[0][0] if queue else next_rescan, next_rescan)
+            time.sleep(max(0.0, min(wake - time.time(), DAEMON_RESCAN)))
+    except KeyboardInterrupt:
+        CACHE.save()
+
+# --- SERVICE ---
+
+SERVE_ADDRESS = "127.0.0.1:8765"
+# How often the service flushes the response cache to disk
+SERVE_CACHE_FLUSH = 60
+
+class TrackingService:
+    # State shared by the request threads of --serve: the tracked list stays in
+    # memory, and trackers keep their pooled connections and policies warm.
+    # The lock guards the list; fetches run outside it. Every request first
+    # checks the store's version, and reloads the list if another process
+    # (a CLI --add, --import, ...) has written to the store since.
+    def __init__(self, workers=None):
+        self.store = get_store()
+        self.version = self.store.version()
+        self.saved_list = self.store.load()
+        self.workers = workers
+        self.lock = threading.RLock()
+
+    def sync(self):
+        with self.lock:
+            version = self.store.version()
+            if version != self.version:
+                self.version = version
+                self.saved_list = self.store.load()
+
+    def list(self, courier=None, status=None):
+        self.sync()
+        with self.lock:
+            return {tid: dict(info) for tid, info in self.saved_list.items()
+                    if (not courier or info.get("courier") == courier) and (not status or info.get("status") == status)}
+
+    def get(self, tid):
+        self.sync()
+        with self.lock:
+            info = self.saved_list.get(tid)
+            return None if info is None else dict(info)
+
+    def add(self, tid, courier=None, probe=False):
+        self.sync()
+        if not courier and probe and tid not in self.saved_list: courier, _ = probe_couriers(tid)
+        with self.lock:
+            return add_shipment(self.saved_list, tid, courier)
+
+    def delete(self, tid):
+        self.sync()
+        with self.lock:
+            return delete_shipment(self.saved_list, tid)
+
+    def refresh(self, force=False, no_cache=False, shard=None, workers=None):
+        # Fetch without holding the lock so adds and deletes aren't blocked
+        # meanwhile; record_refresh ignores IDs deleted in the meantime
+        self.sync()
+        with self.lock:
+            pending, skipped = refresh_plan(self.saved_list, force, shard)
+        fetched = refresh_many(pending, workers=workers or self.workers, force=force or no_cache)
+        CACHE.save()
+        with self.lock:
+            changes = record_refresh(self.saved_list, fetched)
+            results = refresh_results(self.saved_list, fetched, skipped)
+            archive_delivered(self.saved_list)
+            return {tid: dict(data) for tid, data in results.items()}, changes
+
+    def refresh_stream(self, force=False, no_cache=False, shard=None, workers=None, batch_size=200):
+        # NDJSON form of refresh(): yields one record per shipment as its fetch
+        # finishes, the same lines stream_refresh writes, recording in batches
+        self.sync()
+        refresh_id = get_store().begin_refresh()
+        with self.lock:
+            pending, skipped = refresh_plan(self.saved_list, force, shard)
+            delivered = [dict(self.saved_list[tid], tracking_number=tid) for tid in skipped]
+        yield from delivered
+        done = {}
+        def flush():
+            with self.lock: record_refresh(self.saved_list, done, refresh_id)
+            done.clear()
+        for tid, data in iter_refresh(pending, workers or self.workers, force or no_cache):
+            if data.get("error"):
+                yield {"tracking_number": tid, "error": data.get("error"), "courier": data.get("courier", "Blue Dart")}
+                continue
+            yield data
+            done[tid] = data
+            if len(done) >= batch_size: flush()
+        if done: flush()
+        CACHE.save()
+        with self.lock: archive_delivered(self.saved_list)
+
+class ServiceHandler:
+    # Request handler for --serve; run_service() mixes it into
+    # http.server.BaseHTTPRequestHandler, so only --serve imports http.server
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACK adds ~40 ms to every keep-alive reply
+    disable_nagle_algorithm = True
+    service = None  # TrackingService, set by run_service
+
+    ROUTES = [
+        ("GET", r"/health", "health"),
+        ("GET", r"/metrics", "metrics"),
+        ("GET", r"/shipments", "list"),
+        ("POST", r"/shipments", "add"),
+        ("GET", r"/shipments/(?P<tid>[^/]+)", "get"),
+        ("DELETE", r"/shipments/(?P<tid>[^/]+)", "delete"),
+        ("GET", r"/track/(?P<tid>[^/]+)", "track"),
+        ("POST", r"/refresh", "refresh"),
+    ]
+
+    def do_GET(self): self._dispatch("GET")
+    def do_POST(self): self._dispatch("POST")
+    def do_DELETE(self): self._dispatch("DELETE")
+    def do_PUT(self): self._dispatch("PUT")
+    def do_PATCH(self): self._dispatch("PATCH")
+    def do_HEAD(self): self._dispatch("HEAD")
+    def do_OPTIONS(self): self._dispatch("OPTIONS")
+
+    def send_error(self, code, message=None, explain=None):
+        # Any other method (or a malformed request line) gets a JSON error
+        # rather than BaseHTTPRequestHandler's HTML page
+        self.close_connection = True
+        self._reply(code, {"error": message or self.responses.get(code, ("error",))[0]})
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self, method):
+        import urllib.parse
+        url = urllib.parse.urlsplit(self.path)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        allowed = False
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, url.path.rstrip("/") or "/")
+            if not match: continue
+            allowed = True
+            if route_method != method and (method, route_method) != ("HEAD", "GET"): continue
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                if not isinstance(body, dict): raise ValueError("request body must be a JSON object")
+                params = {k: urllib.parse.unquote(v) for k, v in match.groupdict().items()}
+                status, payload = getattr(self, "route_" + name)(query, body, **params)
+            except (ValueError, TypeError) as e:
+                status, payload = 400, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+            return self._reply(status, payload)
+        if length: self.rfile.read(length)
+        self._reply(405 if allowed else 404, {"error": "method not allowed" if allowed else "not found"})
+
+    def _reply(self, status, payload):
+        # Only generators stream; a Shipment is a Mapping and goes out as one object
+        if hasattr(payload, "__next__"): return self._reply_stream(status, payload)
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload, default=json_default).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD": self.wfile.write(body)
+
+    def _reply_stream(self, status, records):
+        # One JSON line per record, sent as a chunk as soon as it is produced
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        def chunk(data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        try:
+            for record in records: chunk(json.dumps(record, default=json_default).encode("utf-8") + b"\n")
+        except Exception as e:
+            chunk(json.dumps({"error": str(e)}).encode("utf-8") + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def route_health(self, query, body):
+        return 200, {"ok": True, "shipments": len(self.service.saved_list)}
+
+    def route_metrics(self, query, body):
+        return 200, METRICS.prometheus()
+
+    def route_list(self, query, body):
+        return 200, self.service.list(query.get("courier"), query.get("status"))
+
+    def route_get(self, query, body, tid):
+        info = self.service.get(tid)
+        return (200, info) if info is not None else (404, {"error": f"ID {tid} not found"})
+
+    def route_add(self, query, body):
+        tid = str(body.get("tracking_number") or "").strip()
+        courier = body.get("courier")
+        if not tid: raise ValueError("tracking_number is required")
+        if courier and courier not in COURIERS: raise ValueError(f"unknown courier {courier}")
+        courier, added = self.service.add(tid, courier, bool(body.get("probe")))
+        return (201 if added else 200), {"tracking_number": tid, "courier": courier, "added": added}
+
+    def route_delete(self, query, body, tid):
+        if self.service.delete(tid): return 200, {"deleted": tid}
+        return 404, {"error": f"ID {tid} not found"}
+
+    def route_track(self, query, body, tid):
+        courier = query.get("courier")
+        if courier and courier not in COURIERS: raise ValueError(f"unknown courier {courier}")
+        data = track_one(tid, courier, query.get("probe") == "1", query.get("force") == "1")
+        if data is None: return 404, {"error": f"no tracker for {courier}"}
+        return 200, data
+
+    def route_refresh(self, query, body):
+        shard, workers = body.get("shard"), body.get("workers")
+        if shard is not None:
+            if not (isinstance(shard, list) and len(shard) == 2 and all(type(n) is int for n in shard) and 0 <= shard[0] < shard[1]):
+                raise ValueError("shard must be [index, count] with 0 <= index < count")
+            shard = tuple(shard)
+        if workers is not None and not (type(workers) is int and workers > 0):
+            raise ValueError("workers must be a positive integer")
+        options = (bool(body.get("force")), bool(body.get("no_cache")), shard, workers)
+        if body.get("ndjson"): return 200, self.service.refresh_stream(*options)
+        results, changes = self.service.refresh(*options)
+        return 200, changes if body.get("changes") else results
+
+def make_service_server(address=SERVE_ADDRESS, workers=None):
+    # The --serve HTTP server, bound but not yet serving
+    import http.server
+    host, _, port = address.rpartition(":")
+    handler = type("ServiceHandler", (ServiceHandler, http.server.BaseHTTPRequestHandler),
+                   {"service": TrackingService(workers)})
+    server = http.server.ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+def run_service(address=SERVE_ADDRESS, workers=None):
+    server = make_service_server(address, workers)
+    handler = server.RequestHandlerClass
+
+    def flush_cache():
+        while True:
+            time.sleep(SERVE_CACHE_FLUSH)
+            CACHE.save()
+    threading.Thread(target=flush_cache, daemon=True).start()
+
+    print(f"Serving {len(handler.service.saved_list)} shipments on http://{server.server_address[0]}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        CACHE.save()
+
+class ServiceClient:
+    # Thin client for --server: the same commands, answered by a running --serve
+    def __init__(self, url):
+        import http.client, urllib.parse
+        parts = urllib.parse.urlsplit(url if "://" in url else "http://" + url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=300)
+
+    def call(self, method, path, payload=None):
+        import http.client
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = json.loads(response.read() or b"null")
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise TrackerError(f"tracking service unavailable: {e}")
+        return response.status, data
+
+    def add(self, tid, courier=None, probe=False):
+        return self.call("POST", "/shipments", {"tracking_number": tid, "courier": courier, "probe": probe})
+
+    def delete(self, tid):
+        import urllib.parse
+        return self.call("DELETE", "/shipments/" + urllib.parse.quote(tid, safe=""))
+
+    def track(self, tid, courier=None, probe=False, force=False):
+        import urllib.parse
+        query = urllib.parse.urlencode({k: v for k, v in (("courier", courier), ("probe", "1" if probe else None),
+                                                         ("force", "1" if force else None)) if v})
+        return self.call("GET", "/track/" + urllib.parse.quote(tid, safe="") + ("?" + query if query else ""))
+
+    def refresh(self, force=False, no_cache=False, changes=False, shard=None, workers=None):
+        return self.call("POST", "/refresh", {"force": force, "no_cache": no_cache, "changes": changes,
+                                              "shard": shard and list(shard), "workers": workers})
+
+    def refresh_stream(self, out, force=False, no_cache=False, shard=None, workers=None):
+        # Copies the service's NDJSON refresh to `out` line by line as it arrives
+        import http.client
+        body = json.dumps({"force": force, "no_cache": no_cache, "ndjson": True,
+                           "shard": shard and list(shard), "workers": workers}).encode("utf-8")
+        try:
+            self.conn.request("POST", "/refresh", body=body, headers={"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            if response.status >= 400:
+                raise TrackerError(f"tracking service error {response.status}: {response.read().decode('utf-8', 'replace')}")
+            for line in iter(response.readline, b""):
+                out.write(line.decode("utf-8"))
+                out.flush()
+        except (OSError, http.client.HTTPException) as e:
+            raise TrackerError(f"tracking service unavailable: {e}")
+
+def run_client(args):
+    # Runs the CLI command in args against the service at args.server
+    client = ServiceClient(args.server)
+    if args.add:
+        status, data = client.add(args.add, args.courier, args.probe)
+        if status >= 400: print(f"Error: {data.get('error')}")
+        elif data["added"]: print(f"Added {args.add} ({data['courier']})")
+        else: print(f"Tracking number {args.add} already exists.")
+    elif args.delete:
+        status, data = client.delete(args.delete)
+        print(f"Deleted {args.delete}" if status == 200 else f"ID {args.delete} not found")
+    elif args.tracking_number:
+        _, data = client.track(args.tracking_number, args.courier, args.probe, args.force or args.no_cache)
+        print(json.dumps(data, indent=2))
+    elif args.ndjson:
+        client.refresh_stream(sys.stdout, args.force, args.no_cache, args.shard, args.workers)
+    else:
+        _, data = client.refresh(args.force, args.no_cache, args.changes, args.shard, args.workers)
+        print(json.dumps(data, indent=2))
 
 # --- TUI IMPLEMENTATION ---
 
+# Seconds between view rebuilds (filter + sort) while refresh results stream in
+TUI_RESORT_INTERVAL = 0.5
+
+# Sort orders cycled with S: (label, key factory taking the saved list)
+TUI_SORTS = [
+    ("status", lambda saved: lambda tid: saved[tid].get("status") == "Delivered"),
+    ("courier", lambda saved: lambda tid: saved[tid].get("courier", "")),
+    ("id", lambda saved: lambda tid: tid),
+    ("checked", lambda saved: lambda tid: -(saved[tid].get("checked_at") or 0)),
+]
+
+class TuiRefresh:
+    # Progress of one TUI refresh, as folded in by tui_drain()
+    def __init__(self, total=0):
+        self.total, self.done, self.changed, self.archived = total, 0, 0, 0
+        self.errors = {}  # tid -> last error message
+        self.running = total > 0
+
+def tui_start_refresh(saved_list, view, results, cancel):
+    # What the R key does: refresh every shipment in view, in view order, on a
+    # background worker. Returns (thread, TuiRefresh).
+    items = [(tid, saved_list[tid].get("courier", "Blue Dart")) for tid in view]
+    entries = {tid: dict(saved_list[tid]) for tid in view}
+    cancel.clear()
+    refresh = TuiRefresh(len(items))
+    thread = threading.Thread(target=tui_refresh_worker, args=(items, results, cancel, get_store().begin_refresh(), entries),
+                              daemon=True)
+    thread.start()
+    return thread, refresh
+
+def tui_drain(results, saved_list, refresh):
+    # Fold every message the TUI workers queued since the last call into
+    # saved_list and refresh. The worker has already stored everything, so this
+    # only copies results in. Returns (received, list_changed, details).
+    import queue
+    received, changed, details = 0, False, []
+    while True:
+        try: kind, tid, data = results.get_nowait()
+        except queue.Empty: break
+        received += 1
+        if kind == "result":
+            refresh.done += 1
+            if tid not in saved_list: continue
+            if data.get("error"): refresh.errors[tid] = data["error"]
+            else: refresh.errors.pop(tid, None)
+        elif kind == "recorded":
+            changes, updated = data
+            refresh.changed += len(changes)
+            for rid, info in updated.items():
+                if rid in saved_list: saved_list[rid] = merge_fields(saved_list[rid], {k: info.get(k) for k in REFRESH_FIELDS})
+            changed = True
+        elif kind == "detail": details.append((tid, data))
+        elif kind == "refreshed":
+            refresh.running = False
+            refresh.archived = len(data)
+            for rid in data:
+                saved_list.pop(rid, None)
+                refresh.errors.pop(rid, None)
+            changed = changed or bool(data)
+    return received, changed, details
+
+def tui_refresh_worker(items, results, cancel, refresh_id, entries):
+    # Background refresh for the TUI. Streams ("result", tid, data) into the
+    # results queue as fetches land, records them in the store every
+    # TUI_RESORT_INTERVAL and posts ("recorded", None, (changes, entries)), then
+    # saves the cache, archives and posts ("refreshed", None, archived IDs), so
+    # none of the store work runs on the UI thread. `entries` holds copies of
+    # the saved entries being refreshed; stops early once cancel is set.
+    fetches = iter_refresh(items, force=True)
+    batch, flushed, archived = {}, time.monotonic(), []
+    def flush():
+        changes = record_refresh(entries, batch, refresh_id)
+        results.put(("recorded", None, (changes, {tid: entries[tid] for tid in batch})))
+        batch.clear()
+    try:
+        for tid, data in fetches:
+            results.put(("result", tid, data))
+            if not data.get("error") and tid in entries: batch[tid] = data
+            if batch and time.monotonic() - flushed >= TUI_RESORT_INTERVAL:
+                flush()
+                flushed = time.monotonic()
+            if cancel.is_set(): break
+    finally:
+        fetches.close()
+        try:
+            if batch: flush()
+            CACHE.save()
+            archived = archive_delivered()
+        finally:
+            results.put(("refreshed", None, archived))
+
+def tui_detail_worker(courier, tid, results):
+    data = fetch_details(courier, tid)
+    CACHE.save()
+    results.put(("detail", tid, data))
+
 def run_tui(stdscr):
+    import curses, queue
     # Setup
     curses.curs_set(0)
     stdscr.nodelay(1)
     stdscr.timeout(100)
+    stdscr.keypad(True)
     
     curses.start_color()
     curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLUE)  # Header
@@ -274,35 +3026,109 @@ def run_tui(stdscr):
     curses.init_pair(5, curses.COLOR_CYAN, curses.COLOR_BLACK)  # Courier Badge
     
     saved_list = load_tracking_list()
-    items_list = []
-    
-    def refresh_data_list():
-        nonlocal items_list
-        items_list = []
-        for tid, info in saved_list.items():
-             items_list.append({"id": tid, "info": info})
-        items_list.sort(key=lambda x: 0 if x["info"]["status"] != "Delivered" else 1)
-
-    refresh_data_list()
-    
-    def draw_box(msg):
-        h, w = stdscr.getmaxyx()
-        box_h, box_w = 5, 50
-        start_y, start_x = (h - box_h) // 2, (w - box_w) // 2
-        win = curses.newwin(box_h, box_w, start_y, start_x)
-        win.box()
-        msg_x = (box_w - len(msg)) // 2
-        win.addstr(2, msg_x if msg_x>0 else 1, msg[:box_w-2], curses.A_BOLD)
-        win.refresh()
-        return win
+    results = queue.Queue()  # filled by background workers, drained by the UI loop
+    view = []                # tids after filter + sort; only the visible slice is drawn
+    sort_index, filter_text = 0, ""
+    selected, top = None, 0
+    view_stale, view_built = True, 0.0
+    drawn = {}               # screen row -> what is painted there now
+    message = "Welcome"
+
+    def rebuild_view():
+        nonlocal view, view_stale, view_built
+        needle = filter_text.lower()
+        if needle:
+            def matches(tid):
+                info = saved_list[tid]
+                status = (info.get("summary") or {}).get("status", info.get("status", ""))
+                return needle in tid.lower() or needle in info.get("courier", "").lower() or needle in status.lower()
+            view = [tid for tid in saved_list if matches(tid)]
+        else:
+            view = list(saved_list)
+        view.sort(key=TUI_SORTS[sort_index][1](saved_list))
+        view_stale, view_built = False, time.monotonic()
+
+    def row_segments(tid, is_selected, width):
+        info = saved_list[tid]
+        courier = info.get('courier', 'Unknown')
+        # Shorten courier name
+        c_code = "BD" if courier == "Blue Dart" else "DT" if courier == "DTDC" else "DL"
+        summary = info.get('summary') or {}
+        status = summary.get('status', info.get('status', 'Unknown'))
+        if tid in refresh.errors: status = f"! {refresh.errors[tid]}"
+        line = f" [{c_code}] {tid:<15} | {status[:40]:<40} "[:width - 1]
+        if is_selected: return ((0, line, curses.color_pair(4) | curses.A_BOLD),)
+        is_delivered = "delivered" in status.lower()
+        status_color = curses.color_pair(2) if is_delivered else curses.color_pair(3)
+        # Format: [BD] 123456... | Status
+        return ((0, line, curses.A_NORMAL), (2, c_code, curses.color_pair(5)),
+                (24, f"{status[:40]:<40}"[:max(0, width - 25)], status_color))
+
+    def paint(y, segments):
+        # Only touch rows whose content changed since the last frame
+        if drawn.get(y) == segments: return
+        drawn[y] = segments
+        stdscr.move(y, 0)
+        stdscr.clrtoeol()
+        for x, text, attr in segments:
+            try: stdscr.addstr(y, x, text, attr)
+            except curses.error: pass
+
+    def draw():
+        nonlocal top
+        height, width = stdscr.getmaxyx()
+        rows = max(1, height - 4)
+        index = view.index(selected) if selected in view else 0
+        if index < top: top = index
+        elif index >= top + rows: top = index - rows + 1
+        top = max(0, min(top, max(0, len(view) - rows)))
+
+        # Header
+        shown = f"{top + 1}-{min(top + rows, len(view))}" if view else "0"
+        header = f" MULTI-CARRIER TRACKING | {shown} of {len(view)}/{len(saved_list)} Parcels | sort: {TUI_SORTS[sort_index][0]} "
+        if filter_text: header += f"| filter: {filter_text} "
+        paint(0, ((0, header[:width - 1].ljust(width - 1), curses.color_pair(1)),))
 
-    def ask_courier():
+        # List, virtualized: only rows inside the viewport are rendered
+        list_pad_y = 2
+        for offset in range(rows):
+            pos = top + offset
+            if pos < len(view): paint(list_pad_y + offset, row_segments(view[pos], view[pos] == selected, width))
+            else: paint(list_pad_y + offset, ())
+
+        # Controls
+        controls = "[Q]uit [A]dd [D]el [R]efresh [Enter]Details [S]ort [/]Filter"
+        paint(height - 1, ((0, controls[:width - 1].ljust(width - 1), curses.color_pair(1)),
+                           (max(0, width - len(message) - 2), message[:width - 2], curses.color_pair(1))))
+        stdscr.noutrefresh()
+        curses.doupdate()
+
+    def redraw_all():
+        drawn.clear()
+        stdscr.erase()
+
+    def prompt(label, max_len=20):
+        height, _ = stdscr.getmaxyx()
+        stdscr.nodelay(0) # Blocking input
+        curses.echo(); curses.curs_set(1)
+        stdscr.move(height - 2, 0); stdscr.clrtoeol()
+        stdscr.addstr(height-2, 0, label)
+        try:
+            inp = stdscr.getstr(height-2, len(label) + 1, max_len).decode('utf-8').strip()
+        except: inp = ""
+        curses.noecho(); curses.curs_set(0)
+        stdscr.nodelay(1) # Restore non-blocking
+        stdscr.timeout(100)
+        redraw_all()
+        return inp
+
+    def ask_courier(preselect=None):
         h, w = stdscr.getmaxyx()
         win = curses.newwin(10, 40, (h-10)//2, (w-40)//2)
         win.box()
         win.keypad(True)
-        options = ["Blue Dart", "DTDC", "Delhivery"]
-        sel = 0
+        options = COURIERS
+        sel = options.index(preselect) if preselect in options else 0
         while True:
             win.addstr(1, 2, "Select Courier:", curses.A_BOLD)
             for i, opt in enumerate(options):
@@ -315,243 +3141,287 @@ def run_tui(stdscr):
             elif key == 10: return options[sel] # Enter
             elif key == 27: return None # Esc
 
-    current_row = 0
-    message = "Welcome"
-    
-    while True:
-        stdscr.clear()
+    def show_details(tid, data):
         height, width = stdscr.getmaxyx()
+        courier = saved_list.get(tid, {}).get("courier", data.get("courier", ""))
+        win = curses.newwin(height-4, width-4, 2, 2)
+        win.box()
+        win.addstr(1, 2, f"{courier} | {tid}", curses.A_BOLD)
         
-        # Header
-        header = f" MULTI-CARRIER TRACKING | {len(items_list)} Parcels "
-        stdscr.attron(curses.color_pair(1))
-        stdscr.addstr(0, 0, header + " " * (width - len(header) - 1))
-        stdscr.attroff(curses.color_pair(1))
-        
-        # List
-        list_pad_y = 2
-        for idx, item in enumerate(items_list):
-            if list_pad_y + idx >= height - 2: break
-            
-            tid = item['id']
-            info = item['info']
-            courier = info.get('courier', 'Unknown')
-            # Shorten courier name
-            c_code = "BD" if courier == "Blue Dart" else "DT" if courier == "DTDC" else "DL"
-            
-            summary = info.get('summary') or {}
-            status = summary.get('status', info.get('status', 'Unknown'))
-            is_delivered = "Delivered" in status or "delivered" in status.lower()
-            
-            style = curses.A_NORMAL
-            if idx == current_row: style = curses.color_pair(4) | curses.A_BOLD
+        if "error" in data:
+            win.addstr(3, 2, f"Error: {data['error']}"[:width-8], curses.color_pair(3))
+        else:
+            r = 3
+            # Details
+            for k, v in data.get("delivery_details", {}).items():
+                if r < height-8 and v:
+                    win.addstr(r, 2, f"{k}: {v}"[:width-8])
+                    r += 1
             
-            try:
-                # Format: [BD] 123456... | Status
-                stdscr.addstr(list_pad_y + idx, 0, f" [{c_code}] {tid:<15} | {status[:40]:<40} ", style)
-                # Color hacks if not selected
-                if idx != current_row:
-                    stdscr.addstr(list_pad_y + idx, 2, c_code, curses.color_pair(5))
-                    status_color = curses.color_pair(2) if is_delivered else curses.color_pair(3)
-                    stdscr.addstr(list_pad_y + idx, 24, f"{status[:40]:<40}", status_color)
-            except: pass
+            r += 1
+            win.addstr(r, 2, "HISTORY:", curses.A_BOLD); r+=1
+            for s in data.get("scans", []):
+                if r < height-6:
+                    line = f"{s.get('date')} {s.get('time')} {s.get('location')} - {s.get('details')}"
+                    win.addstr(r, 2, line[:width-10]); r+=1
+        
+        win.addstr(height-6, 2, "Press Any Key")
+        win.refresh()
+        win.timeout(-1)
+        win.getch()
+        del win
+        redraw_all()
 
-        # Controls
-        controls = "[Q]uit [A]dd [D]el [R]efresh [Enter]Details"
-        try:
-            stdscr.addstr(height-1, 0, controls, curses.color_pair(1))
-            stdscr.addstr(height-1, width - len(message) - 2, message, curses.color_pair(1))
-        except: pass
+    # State of the background refresh, if one is running
+    refresh_thread, cancel, refresh = None, threading.Event(), TuiRefresh()
+
+    def drain():
+        # Fold everything the workers produced since the last tick into the list
+        nonlocal refresh_thread, message, view_stale
+        received, changed, details = tui_drain(results, saved_list, refresh)
+        if changed: view_stale = True
+        if refresh_thread and not refresh.running:
+            refresh_thread = None
+            message = f"Refreshed! {refresh.changed} changed, {len(refresh.errors)} errors, {refresh.archived} archived"
+        elif refresh_thread:
+            message = f"Refreshing {refresh.done}/{refresh.total}..."
+        for tid, data in details:
+            message = f"Fetched {tid}"
+            show_details(tid, data)
+        return received > 0
+
+    rebuild_view()
+    selected = view[0] if view else None
+    dirty = True
+
+    while True:
+        if drain(): dirty = True
+        if view_stale and (not refresh_thread or time.monotonic() - view_built >= TUI_RESORT_INTERVAL):
+            rebuild_view()
+            dirty = True
+        if dirty:
+            # Nothing is repainted while idle; only rows that differ reach the terminal
+            if selected not in view: selected = view[0] if view else None
+            draw()
+            dirty = False
 
         key = stdscr.getch()
+        if key == -1: continue
+        dirty = True
+        height, _ = stdscr.getmaxyx()
+        index = view.index(selected) if selected in view else 0
+        page = max(1, height - 4)
         
-        if key in [ord('q'), ord('Q')]: break
-        elif key == curses.KEY_DOWN and current_row < len(items_list)-1: current_row += 1
-        elif key == curses.KEY_UP and current_row > 0: current_row -= 1
+        if key in [ord('q'), ord('Q')]:
+            if refresh_thread:
+                message = "Stopping refresh..."
+                draw()
+                cancel.set()
+                refresh_thread.join()
+                drain()
+            break
+        elif key == curses.KEY_RESIZE: redraw_all()
+        elif key == curses.KEY_DOWN and index < len(view)-1: selected = view[index + 1]
+        elif key == curses.KEY_UP and index > 0: selected = view[index - 1]
+        elif key == curses.KEY_NPAGE and view: selected = view[min(len(view) - 1, index + page)]
+        elif key == curses.KEY_PPAGE and view: selected = view[max(0, index - page)]
+        elif key == curses.KEY_HOME and view: selected = view[0]
+        elif key == curses.KEY_END and view: selected = view[-1]
+
+        elif key in [ord('s'), ord('S')]:
+            sort_index = (sort_index + 1) % len(TUI_SORTS)
+            rebuild_view()
+            message = f"Sorted by {TUI_SORTS[sort_index][0]}"
+
+        elif key == ord('/'):
+            filter_text = prompt("Filter (blank clears):", 30)
+            rebuild_view()
+            message = f"{len(view)} match" if filter_text else "Filter cleared"
         
         elif key in [ord('a'), ord('A')]:
-            # 1. Ask Courier
-            courier = ask_courier()
-            stdscr.clear()
-            if courier:
-                # 2. Ask ID
-                stdscr.nodelay(0) # Blocking input
-                curses.echo(); curses.curs_set(1)
-                stdscr.addstr(height-2, 0, f"Enter {courier} ID: ")
-                try:
-                    inp = stdscr.getstr(height-2, 20, 20).decode('utf-8').strip()
-                    if inp:
-                        if inp not in saved_list:
-                            saved_list[inp] = {"courier": courier, "status": "Pending"}
-                            save_tracking_list(saved_list)
-                            refresh_data_list()
-                            message = f"Added {inp}"
-                        else: message = "Exists!"
-                except: pass
-                curses.noecho(); curses.curs_set(0)
-                stdscr.nodelay(1) # Restore non-blocking
+            # 1. Ask ID
+            inp = prompt("Enter Tracking ID:")
+            if inp:
+                # 2. Confirm Courier, best guess preselected
+                courier = ask_courier(guess_courier(inp))
+                redraw_all()
+                if courier:
+                    if inp not in saved_list:
+                        saved_list[inp] = {"courier": courier, "status": "Pending"}
+                        get_store().upsert(inp, saved_list[inp])
+                        rebuild_view()
+                        selected = inp if inp in view else selected
+                        message = f"Added {inp}"
+                    else: message = "Exists!"
         
         elif key in [ord('d'), ord('D')]: 
             # Delete Logic (simplified from previous)
-            if items_list:
-                tid = items_list[current_row]['id']
+            if selected:
+                tid = selected
                 del saved_list[tid]
-                save_tracking_list(saved_list)
-                refresh_data_list()
-                if current_row >= len(items_list): current_row = max(0, len(items_list)-1)
+                refresh.errors.pop(tid, None)
+                get_store().delete(tid)
+                view.remove(tid)
+                selected = view[min(index, len(view) - 1)] if view else None
                 message = f"Deleted {tid}"
         
         elif key in [ord('r'), ord('R')]:
-            loader = draw_box("Refreshing all...")
-            for i, item in enumerate(items_list):
-                tid = item['id']
-                courier = item['info'].get("courier", "Blue Dart")
-                loader.addstr(2, 2, f"Checking {courier} {tid}"[:46]); loader.refresh()
-                
-                tracker = get_tracker(courier)
-                if tracker:
-                    data = tracker.get_details(tid)
-                    if not data.get("error"):
-                        status = data.get("status", "Unknown")
-                        summary = {
-                            "status": status,
-                            "recipient": data.get("delivery_details", {}).get("Recipient", "N/A")
-                        }
-                        saved_list[tid].update({
-                            "status": "Delivered" if "Delivered" in status else "Pending",
-                            "last_checked": "Now",
-                            "summary": summary
-                        })
-            save_tracking_list(saved_list)
-            del loader
-            refresh_data_list()
-            message = "Refreshed!"
+            if refresh_thread:
+                message = "Refresh already running"
+            else:
+                # Fetch in the background; rows update as results arrive
+                refresh_thread, refresh = tui_start_refresh(saved_list, view, results, cancel)
+                message = f"Refreshing 0/{refresh.total}..."
 
         elif key == 10: # Enter (Details)
-            if items_list:
-                tid = items_list[current_row]['id']
-                info = items_list[current_row]['info']
-                courier = info.get("courier", "Blue Dart")
-                
-                loader = draw_box(f"Fetching {courier}...")
-                tracker = get_tracker(courier)
-                data = tracker.get_details(tid)
-                del loader
-                
-                # Show details window
-                win = curses.newwin(height-4, width-4, 2, 2)
-                win.box()
-                win.addstr(1, 2, f"{courier} | {tid}", curses.A_BOLD)
-                
-                if "error" in data:
-                    win.addstr(3, 2, f"Error: {data['error']}", curses.color_pair(3))
-                else:
-                    r = 3
-                    # Details
-                    for k, v in data.get("delivery_details", {}).items():
-                        if r < height-8 and v:
-                            win.addstr(r, 2, f"{k}: {v}")
-                            r += 1
-                    
-                    r += 1
-                    win.addstr(r, 2, "HISTORY:", curses.A_BOLD); r+=1
-                    for s in data.get("scans", []):
-                        if r < height-6:
-                            line = f"{s.get('date')} {s.get('time')} {s.get('location')} - {s.get('details')}"
-                            win.addstr(r, 2, line[:width-10]); r+=1
-                
-                win.addstr(height-6, 2, "Press Any Key")
-                win.refresh()
-                win.getch()
-                del win
-                stdscr.touchwin() # Redraw background
+            if selected:
+                courier = saved_list[selected].get("courier", "Blue Dart")
+                threading.Thread(target=tui_detail_worker, args=(courier, selected, results), daemon=True).start()
+                message = f"Fetching {courier} {selected}..."
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("tracking_number", nargs="?", help="Optional Tracking Number")
     parser.add_argument("--add", help="Add ID")
     parser.add_argument("--delete", help="Delete ID")
-    parser.add_argument("--courier", choices=["Blue Dart", "DTDC", "Delhivery"], help="Courier Name")
+    parser.add_argument("--courier", choices=COURIERS, help="Courier Name (detected from the ID if omitted)")
+    parser.add_argument("--probe", action="store_true", help="If the courier is ambiguous, query all candidates at once")
     parser.add_argument("--json", action="store_true", help="Output JSON")
-    parser.add_argument("--force", action="store_true", help="Force Refresh")
-    parser.add_argument("--test-file", help="Test HTML file")
+    parser.add_argument("--changes", action="store_true", help="Refresh and output only new scans and status changes (JSON)")
+    parser.add_argument("--ndjson", action="store_true", help="Refresh and stream one JSON line per shipment as it finishes")
+    parser.add_argument("--import", dest="import_file", metavar="FILE", help="Bulk add IDs from a CSV or NDJSON file")
+    parser.add_argument("--force", action="store_true", help="Force Refresh (implies --no-cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass cached results and refetch")
+    parser.add_argument("--test-file", help="Parse this saved response (Blue Dart HTML, DTDC/Delhivery JSON) instead of fetching")
+    parser.add_argument("--base-url", help="Send all carrier requests to this host, e.g. a local replay server")
+    parser.add_argument("--workers", type=int, help="Max parallel fetches per courier during refresh")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="Refresh only slice i of N (1-based); run N processes to split a refresh")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and poll each shipment when it is due")
+    parser.add_argument("--stats", action="store_true", help="Print per-courier request timings to stderr on exit")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics to this file (each poll cycle with --daemon)")
+    parser.add_argument("--find", metavar="ID", help="Show a tracked or archived shipment with its scan history (JSON)")
+    parser.add_argument("--archive", action="store_true", help="Move delivered shipments past --archive-after into the archive now")
+    parser.add_argument("--archive-after", type=float, metavar="DAYS",
+                        help=f"Archive delivered shipments this many days after delivery, negative to never (default {ARCHIVE_AFTER_DAYS:g})")
+    parser.add_argument("--keep-raw", action="store_true",
+                        help=f"Save raw carrier responses under {RAW_ARCHIVE_DIR}/ for --reparse (or set TRACKER_KEEP_RAW=1)")
+    parser.add_argument("--reparse", action="store_true",
+                        help="Re-parse the newest saved response of each shipment with the current parsers; no network")
+    parser.add_argument("--report", action="store_true",
+                        help="Transit time per lane and dwell time per hub from stored and archived scans (--json, --courier)")
+    parser.add_argument("--serve", nargs="?", const=SERVE_ADDRESS, metavar="HOST:PORT",
+                        help=f"Run the local JSON HTTP API (default {SERVE_ADDRESS})")
+    parser.add_argument("--server", default=os.environ.get("TRACKER_SERVER"), metavar="URL",
+                        help="Send --add/--delete/track/refresh to a running --serve instead of working locally")
     args = parser.parse_args()
-    
-    saved_list = load_tracking_list()
+    if args.base_url: set_base_url(args.base_url)
+    if args.archive_after is not None: ARCHIVE_AFTER_DAYS = args.archive_after
+    if args.keep_raw and RAW_ARCHIVE is None: RAW_ARCHIVE = RawArchive()
+    if args.stats or args.metrics_file: atexit.register(export_metrics, args.stats, args.metrics_file)
+
+    if args.serve:
+        run_service(args.serve, workers=args.workers)
+        sys.exit(0)
+
+    if args.server and (args.add or args.delete or (args.tracking_number and not args.test_file)
+                        or args.json or args.ndjson or args.force or args.changes or args.shard):
+        try:
+            run_client(args)
+        except TrackerError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.find:
+        record = find_shipment(args.find)
+        if record is None:
+            print(f"ID {args.find} not found")
+            sys.exit(1)
+        print(json.dumps(record, indent=2))
+        sys.exit(0)
+
+    if args.report:
+        report = transit_report(args.courier)
+        if args.json: print(json.dumps(report, indent=2))
+        else: print_report(report)
+        sys.exit(0)
+
+    if args.reparse:
+        parsed, failed, changes = reparse_archive(load_tracking_list(), workers=args.workers)
+        if args.changes:
+            print(json.dumps(changes, indent=2))
+        else:
+            print(f"Re-parsed {len(parsed)} shipments ({len(failed)} failed, {len(changes)} changed)")
+        sys.exit(0)
+
+    if args.archive:
+        archived = archive_delivered(after_days=max(0.0, ARCHIVE_AFTER_DAYS))
+        print(f"Archived {len(archived)} delivered shipments")
+        sys.exit(0)
+
+    # Streaming and single-record paths read and write the store directly;
+    # only the daemon, batch refresh and TUI load the whole list
+    if args.import_file:
+        added, existing, invalid = import_shipments(args.import_file)
+        print(f"Imported {added} shipments ({existing} already tracked, {invalid} invalid rows)")
+        sys.exit(0)
+
+    if args.ndjson:
+        stream_refresh(sys.stdout, workers=args.workers, force=args.force, no_cache=args.no_cache, shard=args.shard)
+        CACHE.save()
+        sys.exit(0)
 
     # Case 1: Add new ID
     if args.add:
-        courier = args.courier or "Blue Dart" # Default
-        if args.add not in saved_list:
-            saved_list[args.add] = {"courier": courier, "status": "Pending"}
-            save_tracking_list(saved_list)
-            print(f"Added {args.add} ({courier})")
-        else:
-            print(f"Tracking number {args.add} already exists.")
+        courier, added = add_shipment(None, args.add, args.courier, args.probe)
+        if added: print(f"Added {args.add} ({courier})")
+        else: print(f"Tracking number {args.add} already exists.")
         sys.exit(0)
 
     # Case 2: Delete ID
     if args.delete:
-        if args.delete in saved_list:
-            del saved_list[args.delete]
-            save_tracking_list(saved_list)
-            print(f"Deleted {args.delete}")
-        else:
-            print(f"ID {args.delete} not found")
+        if delete_shipment(None, args.delete): print(f"Deleted {args.delete}")
+        else: print(f"ID {args.delete} not found")
         sys.exit(0)
 
     # Case 3: Single ID Track
     if args.tracking_number:
-        courier = args.courier or "Blue Dart"
+        courier = args.courier or guess_courier(args.tracking_number)
         tracker = get_tracker(courier)
         if tracker:
-            data = tracker.get_details(args.tracking_number) # TODO: Pass test-file if supported by tracker
+            if args.test_file:
+                data = tracker.parse_file(args.test_file, args.tracking_number)
+            else:
+                data = track_one(args.tracking_number, args.courier, args.probe, args.force or args.no_cache)
+            CACHE.save()
             if args.json:
-                print(json.dumps(data, indent=2))
+                print(json.dumps(data, indent=2, default=json_default))
             else:
                 # Basic print for now since print_pretty was not fully migrated yet? 
                 # Or we can just print JSON for CLI single track in this version or generic print.
-                print(json.dumps(data, indent=2)) 
+                print(json.dumps(data, indent=2, default=json_default)) 
         sys.exit(0)
 
-    # Case 4: Batch/JSON Mode
-    if args.json or args.force:
-        results = {}
-        for tid, info in saved_list.items():
-            courier = info.get("courier", "Blue Dart")
-            status = info.get("status")
-            
-            # Skip if delivered and not forced
-            if status == "Delivered" and not args.force:
-                results[tid] = info
-                continue
-            
-            tracker = get_tracker(courier)
-            if tracker:
-                data = tracker.get_details(tid)
-                # Update saved list
-                if not data.get("error"):
-                    status_txt = data.get("status", "Unknown")
-                    summary = {
-                        "status": status_txt,
-                        "recipient": data.get("delivery_details", {}).get("Recipient", "N/A")
-                    }
-                    saved_list[tid].update({
-                        "status": "Delivered" if "Delivered" in status_txt else "Pending",
-                        "last_checked": "Now",
-                        "summary": summary
-                    })
-                    results[tid] = data # Return full data in JSON output
-                else:
-                    results[tid] = {"error": data.get("error"), "courier": courier}
-        
-        save_tracking_list(saved_list)
-        if args.json:
-            print(json.dumps(results, indent=2))
+    # Case 4: Daemon
+    if args.daemon:
+        run_daemon(load_tracking_list(), workers=args.workers, metrics_file=args.metrics_file, shard=args.shard)
+        sys.exit(0)
+
+    # Case 5: Batch/JSON Mode
+    if args.json or args.force or args.changes:
+        saved_list = load_tracking_list()
+        results, changes = refresh_tracked(saved_list, args.workers, args.force, args.no_cache, args.shard)
+        archive_delivered(saved_list)
+        if args.changes:
+            print(json.dumps(changes, indent=2))
+        elif args.json:
+            print(json.dumps(results, indent=2, default=json_default))
         sys.exit(0)
 
     # Default: TUI
     try:
+        import curses
         curses.wrapper(run_tui)
     except Exception as e:
         print(f"TUI Error: {e}")